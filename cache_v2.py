@@ -0,0 +1,131 @@
+import os
+import json
+import hashlib
+from intbase import ErrorType
+from source_v2 import MappedSource
+
+# ResultCache remembers what runs of a program did: the output log, the error type and line, and the
+# error's message, keyed by a hash of the source, the input lines, the options that change what a
+# program does (fail_fast, short_circuit, lazy loading) and the interpreter version, which is a hash
+# of the interpreter's own source files, so editing the interpreter never serves results it wouldn't
+# give.
+# Each result is a small JSON file in directory. A file's modification time is when it was last used,
+# and once the files add up to more than max_bytes, or there are more than max_entries of them, the
+# least recently used ones are deleted. Several processes may share a directory.
+class ResultCache:
+  def __init__(self, directory, max_bytes=64 * 1024 * 1024, max_entries=None):
+    self.directory = directory
+    self.max_bytes = max_bytes
+    self.max_entries = max_entries
+    os.makedirs(directory, exist_ok=True)
+    self.hits = self.misses = self.stores = self.evictions = 0
+    self.entries, self.used = self._scan()
+
+  # the key of a run of program (a list of lines, or a MappedSource, whose file is hashed as it is
+  # rather than decoded into lines) on input with the given options
+  def key(self, program, input, options=()):
+    digest = hashlib.sha256(interpreter_version().encode())
+    if type(program) is MappedSource:
+      program = hashlib.sha256(program.data).hexdigest()
+    for part in (program, input or [], options):
+      digest.update(json.dumps(part).encode())
+    return digest.hexdigest()
+
+  # the (output log, error type, error line, error message) stored under key, or None
+  def get(self, key):
+    path = self._path(key)
+    try:
+      with open(path) as f:
+        entry = json.load(f)
+      os.utime(path)
+    except (OSError, ValueError):
+      self.misses += 1
+      return None
+    self.hits += 1
+    error_type = ErrorType[entry['error_type']] if entry['error_type'] else None
+    return entry['output'], error_type, entry['error_line'], entry['message']
+
+  def put(self, key, output, error_type, error_line, message=None):
+    data = json.dumps({'output': output, 'error_type': error_type.name if error_type else None,
+                       'error_line': error_line, 'message': message}).encode()
+    path = self._path(key)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+      f.write(data)
+    os.replace(temp_path, path)
+    self.stores += 1
+    self.entries += 1
+    self.used += len(data)
+    if self.used > self.max_bytes or (self.max_entries is not None and self.entries > self.max_entries):
+      self._evict()
+
+  def stats(self):
+    return {'hits': self.hits, 'misses': self.misses, 'stores': self.stores, 'evictions': self.evictions,
+            'entries': self.entries, 'bytes': self.used}
+
+  # delete every stored result
+  def clear(self):
+    for name in os.listdir(self.directory):
+      if name.endswith('.json'):
+        _remove(os.path.join(self.directory, name))
+    self.entries, self.used = self._scan()
+
+  # delete least recently used results until what is left is within the limits; the directory is
+  # listed again first, since other processes may have added or removed results
+  def _evict(self):
+    files = []
+    for name in os.listdir(self.directory):
+      if name.endswith('.json'):
+        try:
+          stat = os.stat(os.path.join(self.directory, name))
+        except OSError:
+          continue
+        files.append((stat.st_mtime, stat.st_size, name))
+    files.sort()
+    self.entries = len(files)
+    self.used = sum(size for _, size, _ in files)
+    for _, size, name in files:
+      if self.used <= self.max_bytes and (self.max_entries is None or self.entries <= self.max_entries):
+        break
+      if _remove(os.path.join(self.directory, name)):
+        self.evictions += 1
+      self.entries -= 1
+      self.used -= size
+
+  def _scan(self):
+    entries = used = 0
+    for name in os.listdir(self.directory):
+      if name.endswith('.json'):
+        try:
+          used += os.path.getsize(os.path.join(self.directory, name))
+          entries += 1
+        except OSError:
+          pass
+    return entries, used
+
+  def _path(self, key):
+    return os.path.join(self.directory, key + '.json')
+
+# whether another process got there first doesn't matter
+def _remove(path):
+  try:
+    os.remove(path)
+    return True
+  except OSError:
+    return False
+
+_version = None
+
+# a hash of the interpreter's source files, computed once per process
+def interpreter_version():
+  global _version
+  if _version is None:
+    here = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(here)):
+      if name.endswith('.py'):
+        digest.update(name.encode())
+        with open(os.path.join(here, name), 'rb') as f:
+          digest.update(f.read())
+    _version = digest.hexdigest()
+  return _version
@@ -0,0 +1,842 @@
+import bisect
+import functools
+import itertools
+import operator
+from intbase import InterpreterBase, ErrorType
+from val_v2 import Type
+
+RESERVED_RESULT = "this_is_the_reserved_result_variable"   # the unknown variable a return in main reports
+RETURN_VAR = ('return',)   # key in a frame's outermost scope for its return register, which no name can clash with
+UNKNOWN = 'unknown'   # type of a name we know exists but whose type we can't prove
+OPEN = ('*',)         # key in an outermost scope that calls may have leaked unknown names into
+MANY = ('+',)         # key in a scope that stands for "at least this many" identical copies of itself
+SOME = ('?',)         # key in a scope that summarizes zero or more scopes holding (some of) its names
+MAX_COPIES = 2        # leaked scopes can pile up forever at runtime, so we stop counting copies here
+MAX_DEPTH = 6         # deeper stacks get their middle folded into one SOME scope
+KEEP_DEPTH = 3        # innermost scopes kept exact when folding
+MAX_STATES = 32       # give up on a function once one of its lines has this many distinct scope stacks
+
+# every type collapses to its non-ref class for checking, just like _ref_type_checker does
+TYPE_CLASS = {Type.INT: Type.INT, Type.REFINT: Type.INT,
+              Type.BOOL: Type.BOOL, Type.REFBOOL: Type.BOOL,
+              Type.STRING: Type.STRING, Type.REFSTRING: Type.STRING}
+DECLARED_CLASS = {InterpreterBase.INT_DEF: Type.INT, InterpreterBase.BOOL_DEF: Type.BOOL,
+                  InterpreterBase.STRING_DEF: Type.STRING}
+RESULT_NAMES = {Type.INT: 'resulti', Type.BOOL: 'resultb', Type.STRING: 'results'}
+REF_TYPES = [Type.REFINT, Type.REFBOOL, Type.REFSTRING]
+
+# result class of every binary operator for each operand class; operators missing from a class are type errors
+ARITH = ['+', '-', '*', '/', '%']
+COMPARE = ['==', '!=', '<', '<=', '>', '>=']
+BINARY_OPS = ARITH + COMPARE + ['&', '|']
+BINARY_RESULTS = {
+  Type.INT: dict([(op, Type.INT) for op in ARITH] + [(op, Type.BOOL) for op in COMPARE]),
+  Type.STRING: dict([('+', Type.STRING)] + [(op, Type.BOOL) for op in COMPARE]),
+  Type.BOOL: {'&': Type.BOOL, '|': Type.BOOL, '==': Type.BOOL, '!=': Type.BOOL},
+}
+
+class _Unknown(Exception):
+  pass
+
+# A scope of a checker state: the names in top, then those in base. Scopes are never changed once made,
+# and a checker makes one scope per distinct contents (see StaticChecker._intern), so states share
+# their scopes, a line that leaves its state alone passes the same scopes on, and states are compared
+# and hashed by the identity of their scopes. hash is the xor of the hashes of the scope's items, which
+# a scope made from another by setting a few names gets in as many steps. Such a scope shares base and
+# copies only top, which goes into a new base once it outgrows the square root of it, so declaring n
+# names one line at a time copies about n**1.5 names rather than n**2.
+class _Scope:
+  __slots__ = ('top', 'base', 'hash', 'content')
+
+  def __init__(self, top, base, scope_hash):
+    self.top = top
+    self.base = base
+    self.hash = scope_hash
+    self.content = None   # this scope without its MANY or SOME marker, once _content has made it
+
+  def __contains__(self, name):
+    return name in self.top or name in self.base
+
+  def __getitem__(self, name):
+    return self.top[name] if name in self.top else self.base[name]
+
+  def get(self, name, default=None):
+    return self.top[name] if name in self.top else self.base.get(name, default)
+
+  def __iter__(self):
+    return iter(self.as_dict())
+
+  def items(self):
+    return self.as_dict().items()
+
+  def as_dict(self):
+    return {**self.base, **self.top} if self.top else self.base
+
+EMPTY = _Scope({}, {}, 0)
+MISSING = object()
+MIN_TOP = 8   # names a scope's top can always hold before going into its base
+
+class _Error(Exception):
+  def __init__(self, error_type, description):
+    self.error_type = error_type
+    self.description = description
+
+# The StaticChecker runs over the tokenized program once before execution. For every function it
+# simulates the interpreter's scope handling over the set of scope stacks (name -> type class) that
+# can reach each line, pushing and popping exactly where _if/_else/_endif/_while/_endwhile do at runtime
+# (including the scopes those leave behind). A line whose checks pass on every reaching stack is marked
+# in self.proven so the interpreter can skip them; a line that fails on every reaching stack is recorded
+# in self.errors with the error the interpreter would raise there.
+class StaticChecker:
+  def __init__(self, tokenized_program, indents, func_manager, short_circuit=False, exported=False, lazy=False,
+               cached=None, on_demand=False):
+    self.tokenized_program = tokenized_program
+    self.indents = indents
+    self.func_manager = func_manager
+    self.short_circuit = short_circuit
+    self.exported = exported  # every function can also be entered from outside with all of its parameters
+    self.lazy = lazy          # functions are only checked when check_function asks, see _entry_states
+    self.on_demand = on_demand  # the same, but with the whole program there to find call sites in
+    self.cached = cached or {}  # check results a library_v2.FunctionCache keeps by piece, to reuse and add to
+    self.proven = [False] * len(tokenized_program)
+    self.types = [None] * len(tokenized_program)   # proven type class of each line's expression, if any
+    self.errors = []                               # (line, ErrorType, description), sorted by line
+    if lazy or on_demand:
+      self._results = {}
+      self._order = {}
+      self._havoc = True   # the lines that could let refs escape may never be looked at
+      self.call_sites = None   # found by the first check_function on demand
+      self._index_spans()
+      self._index_headers()
+      return
+    self._find_call_sites()
+    self._check_all()
+
+  def first_error(self):
+    return self.errors[0] if self.errors else None
+
+  # Bring everything up to date after lines start up to old_end, which held old_lines, were replaced by
+  # lines start up to new_end of the (already patched) tokenized program and function table. Only the
+  # functions whose check looked at a changed line, or whose call sites changed, are checked again;
+  # everything is checked again if signatures changed or refs started or stopped escaping.
+  def patch(self, start, old_end, new_end, old_lines, signatures_changed):
+    delta = new_end - old_end
+    new_lines = self.tokenized_program[start:new_end]
+    self.cached = {}   # the pieces no longer start where they did
+    self.proven[start:old_end] = [False] * (new_end - start)
+    self.types[start:old_end] = [None] * (new_end - start)
+    callees = set()
+    for line in old_lines:
+      if len(line) >= 2 and line[0] == InterpreterBase.FUNCCALL_DEF:
+        callees.add(line[1])
+        self.call_sites[line[1]].remove(line[2:])
+    for line in new_lines:
+      if len(line) >= 2 and line[0] == InterpreterBase.FUNCCALL_DEF:
+        callees.add(line[1])
+        self.call_sites.setdefault(line[1], []).append(line[2:])
+    if signatures_changed or any(line and line[0] in [InterpreterBase.RETURN_DEF, InterpreterBase.FUNCCALL_DEF,
+                                                      InterpreterBase.ENDFUNC_DEF]
+                                 for line in old_lines + new_lines):
+      if signatures_changed or self._has_indirect_refs() != self._havoc:
+        self.errors = []
+        self.proven[:] = [False] * len(self.tokenized_program)
+        self.types[:] = [None] * len(self.tokenized_program)
+        self._check_all()
+        return
+
+    recheck = set(name for name in callees if name in self.func_manager.func_cache)
+    recheck.update(self._checks_looking_at(start, old_end - 1))
+    lo, hi = start, new_end - 1   # lines whose summary may change
+    for name in recheck:   # their old outcomes go away, wherever those ended up after the edit
+      first, last = self._results[name][0], self._results[name][1]
+      lo = min(lo, self._moved(first, start, old_end, delta, start))
+      hi = max(hi, self._moved(last, start, old_end, delta, new_end - 1))
+    if delta:
+      for name, result in self._results.items():
+        if name not in recheck and result[0] >= old_end:
+          result[0] += delta
+          result[1] += delta
+    self.errors = [(line_num + delta if line_num >= old_end else line_num, error_type, description)
+                   for line_num, error_type, description in self.errors if not start <= line_num < old_end]
+    spans_changed = delta != 0
+    for name in recheck:
+      span = self._results[name][:2]
+      self._check_function(name)
+      spans_changed = spans_changed or self._results[name][:2] != span
+      lo = min(lo, self._results[name][0])
+      hi = max(hi, self._results[name][1])
+    if spans_changed:
+      self._index_spans()
+    self._summarize(lo, hi)
+
+  # where line_num of the old program is after the edit; lines that were replaced map to inside
+  def _moved(self, line_num, start, old_end, delta, inside):
+    if line_num < start:
+      return line_num
+    if line_num >= old_end:
+      return line_num + delta
+    return inside
+
+  # Lazy checkers check one function at a time, just before it first runs; lines other functions'
+  # checks looked at too are summarized again with this function's outcomes added. On demand, the
+  # interpreter only asks once a function has run often enough to pay for its check, so unchecked
+  # functions run too: _summarize proves nothing among their lines, and the first call also checks
+  # every function that could run out of its own lines (see _keeps_to_piece), so the lines of a
+  # checked function are only ever run by checked ones.
+  def check_function(self, func_name):
+    names = [func_name]
+    if self.on_demand and self.call_sites is None:
+      self._find_call_sites()
+      self._havoc = self._has_indirect_refs()
+      bounds = self._headers + [len(self.tokenized_program)]
+      names += [name for i, name in enumerate(self._header_names)
+                if name != func_name and not self._keeps_to_piece(bounds[i], bounds[i + 1])]
+    for name in names:
+      self._order[name] = len(self._order)
+      self._check_function(name)
+    self._index_spans()
+    for name in names:
+      first, last = self._results[name][:2]
+      self._summarize(first, last)
+
+  def _check_all(self):
+    self._results = {}   # function name -> [first line, last line, {line - first line: outcomes}] its check looked at
+    self._havoc = self._has_indirect_refs()
+    for func_name in self.func_manager.func_cache:
+      self._check_function(func_name)
+    self._order = dict((func_name, i) for i, func_name in enumerate(self.func_manager.func_cache))
+    self._index_spans()
+    self._summarize(0, len(self.tokenized_program) - 1)
+
+  # the spans of every function's check sorted by first line, with the furthest last line seen so far,
+  # so the checks that looked at some lines can be found without going through all of them
+  def _index_spans(self):
+    self._spans = sorted((result[0], result[1], func_name) for func_name, result in self._results.items())
+    self._span_firsts = [span[0] for span in self._spans]
+    self._span_reach = list(itertools.accumulate((span[1] for span in self._spans), max))
+
+  # the func line of every function in order and the function's name, for function_at
+  def _index_headers(self):
+    headers = sorted((func_info.start_ip - 1, func_name) for func_name, func_info in self.func_manager.func_cache.items())
+    self._headers = [header for header, _ in headers]
+    self._header_names = [func_name for _, func_name in headers]
+
+  # the function whose lines line_num is among (from its func line up to the next one), or None before the first
+  def function_at(self, line_num):
+    i = bisect.bisect_right(self._headers, line_num) - 1
+    return self._header_names[i] if i >= 0 else None
+
+  # Whether no scan an if, else, while or endwhile between the func line lo and the next one, hi, could
+  # do runs past either of them, going by the same rules as _find_forward, _find_endwhile and
+  # _find_while, whichever of those lines are reached. Running on past a func line only ever happens by
+  # a scan, since executing one is an error.
+  def _keeps_to_piece(self, lo, hi):
+    ifs, elses, whiles = set(), set(), set()   # indents of the lines still scanning forward
+    unbroken = True            # no blank line since lo, which would stop an endwhile's scan back
+    lowest = self.indents[lo]  # the lowest indent since lo, which stops it too if it is lower
+    found = set()              # indents of the whiles since lo, one of which it could find
+    for line_num in range(lo + 1, hi):
+      tokens = self.tokenized_program[line_num]
+      if not tokens:
+        whiles = set()
+        unbroken = False
+        continue
+      indent = self.indents[line_num]
+      whiles = set(while_indent for while_indent in whiles if while_indent <= indent)
+      match tokens[0]:
+        case InterpreterBase.IF_DEF:
+          ifs.add(indent)
+        case InterpreterBase.ELSE_DEF:
+          ifs.discard(indent)
+          elses.add(indent)
+        case InterpreterBase.ENDIF_DEF:
+          ifs.discard(indent)
+          elses.discard(indent)
+        case InterpreterBase.WHILE_DEF:
+          whiles.add(indent)
+        case InterpreterBase.ENDWHILE_DEF:
+          whiles.discard(indent)
+          if unbroken and indent <= lowest and indent not in found:
+            return False
+      if unbroken:
+        lowest = min(lowest, indent)
+        if tokens[0] == InterpreterBase.WHILE_DEF:
+          found.add(indent)
+    if hi == len(self.tokenized_program):
+      return True   # scans stop at the end of the program
+    return not ifs and not elses and all(while_indent > self.indents[hi] for while_indent in whiles)
+
+  # names of the functions whose check looked at any of the lines lo through hi
+  def _checks_looking_at(self, lo, hi):
+    names = []
+    i = bisect.bisect_right(self._span_firsts, hi) - 1
+    while i >= 0 and self._span_reach[i] >= lo:
+      if self._spans[i][1] >= lo:
+        names.append(self._spans[i][2])
+      i -= 1
+    return names
+
+  def _find_call_sites(self):
+    self.call_sites = {}
+    self._call_lines = []   # where the calls are, for _reuse_key, which is done with once patch runs
+    for line_num, line in enumerate(self.tokenized_program):
+      if len(line) >= 2 and line[0] == InterpreterBase.FUNCCALL_DEF:
+        self.call_sites.setdefault(line[1], []).append(line[2:])
+        self._call_lines.append(line_num)
+
+  # Ref parameters hand their caller's variable back through update_references when the callee returns.
+  # If a ref parameter's Value itself escapes (returned directly, or passed on by value) a caller can
+  # end up with arbitrary names in its outermost scope, so we stop trusting outermost scopes after calls.
+  def _has_indirect_refs(self):
+    for func_info in self.func_manager.func_cache.values():
+      ref_params = set(name for name, val in func_info.inputs if self._param_type(val) in REF_TYPES)
+      if not ref_params:
+        continue
+      for tokens in self._function_lines(func_info):
+        if not tokens:
+          continue
+        if tokens[0] == InterpreterBase.RETURN_DEF and len(tokens) == 2 and tokens[1] in ref_params:
+          return True
+        if tokens[0] == InterpreterBase.FUNCCALL_DEF and len(tokens) >= 2:
+          callee = self.func_manager.get_function_info(tokens[1])
+          for i, para in enumerate(tokens[2:]):
+            if para not in ref_params:
+              continue
+            if callee is None or i >= len(callee.inputs) or self._param_type(callee.inputs[i][1]) not in REF_TYPES:
+              return True
+    return False
+
+  def _function_lines(self, func_info):
+    for line_num in range(func_info.start_ip, len(self.tokenized_program)):
+      tokens = self.tokenized_program[line_num]
+      yield tokens
+      if tokens and tokens[0] == InterpreterBase.ENDFUNC_DEF:
+        return
+
+  def _param_type(self, val):
+    return val.type() if val is not None else None
+
+  def _param_class(self, val):
+    return TYPE_CLASS[val.type()] if val is not None else UNKNOWN
+
+  def _return_class(self, func_info):
+    if func_info.return_var == InterpreterBase.VOID_DEF:
+      return InterpreterBase.VOID_DEF
+    return self._param_class(func_info.return_var)
+
+  # every distinct frame a function can be entered with: main's empty frame from run(), plus one per call site
+  def _entry_states(self, func_name, func_info):
+    entries = []
+    if func_name == InterpreterBase.MAIN_FUNC:
+      entries.append((EMPTY,))
+    if self.lazy:
+      # the call sites may not even be tokenized yet, but none can pass more than a prefix of the formals
+      call_sites = [func_info.inputs[:count] for count in range(len(func_info.inputs) + 1)]
+    else:
+      call_sites = self.call_sites.get(func_name, [])
+      if self.exported:
+        call_sites = call_sites + [func_info.inputs]   # Interpreter.call passes exactly the formals
+    for args in call_sites:
+      if len(args) > len(func_info.inputs):
+        continue   # crashes in _funccall before reaching the callee
+      params = {}
+      for name, val in func_info.inputs[:len(args)]:
+        params[name] = self._param_class(val)
+      params[RETURN_VAR] = self._return_class(func_info)
+      entries.append((self._scope(params),))
+    return entries
+
+  def _check_function(self, func_name):
+    func_info = self.func_manager.get_function_info(func_name)
+    header = func_info.start_ip - 1
+    outcomes = {}
+    seen = {}
+    worklist = []
+    self._scanned = [header, func_info.start_ip]   # header, entry line and whatever scans looked at
+    self._scopes = {EMPTY.hash: [EMPTY]}   # hash -> the scopes made for this check, see _intern
+    self._normal = set()                   # states _normalize has made, which it leaves as they are
+    entries = self._entry_states(func_name, func_info)
+    piece = self.cached.get(header)
+    if piece:
+      piece_end, piece_results = piece
+      key = self._reuse_key(func_info, entries, piece_end)
+      if key in piece_results:
+        span, results = piece_results[key]
+        self._results[func_name] = [header, header + span, results]
+        return
+    try:
+      for state in entries:
+        self._add_state(seen, worklist, func_info.start_ip, state)
+      while worklist:
+        line_num, state = worklist.pop()
+        outcome, successors = self._step(line_num, state)
+        outcomes.setdefault(line_num, []).append(outcome)
+        for next_line, next_state in successors:
+          self._add_state(seen, worklist, next_line, next_state)
+    except _Unknown:
+      outcomes = dict((line_num, [(UNKNOWN,)]) for line_num in seen)
+    first = min([self._scanned[0]] + list(seen))
+    last = max([self._scanned[1]] + list(seen))
+    self._results[func_name] = [first, last, dict((line_num - first, results) for line_num, results in outcomes.items())]
+    if piece and first == header and last < piece_end:   # the check only looked at its own piece
+      piece_results[key] = (last - first, self._results[func_name][2])
+
+  # what a check of the function at func_info depends on besides the text of its piece, which ends
+  # before line end: the scope stacks it is entered with, what the functions it calls take and return,
+  # whether calls can leak names, and whether scans that find nothing ran into the end of the program
+  def _reuse_key(self, func_info, entries, end):
+    callees = {}
+    lo = bisect.bisect_left(self._call_lines, func_info.start_ip)
+    for line_num in self._call_lines[lo:bisect.bisect_left(self._call_lines, end, lo)]:
+      func_name = self.tokenized_program[line_num][1]
+      if func_name not in callees:
+        callee = self.func_manager.get_function_info(func_name)
+        if callee is not None:
+          callee = (tuple(self._param_type(val) for name, val in callee.inputs), self._return_class(callee))
+        callees[func_name] = callee
+    states = dict.fromkeys(tuple(frozenset(scope.items()) for scope in state) for state in entries)
+    return tuple(states), tuple(callees.items()), self._havoc, end == len(self.tokenized_program)
+
+  def _add_state(self, seen, worklist, line_num, state):
+    if line_num < 0 or line_num >= len(self.tokenized_program):
+      self._scanned[1] = max(self._scanned[1], line_num)   # lines added here later would be reached
+      return
+    states = seen.setdefault(line_num, set())
+    if state in states:
+      return
+    if len(states) >= MAX_STATES:
+      raise _Unknown()
+    states.add(state)
+    worklist.append((line_num, state))
+
+  # recompute proven, types and errors for lines lo through hi from the outcomes of every function there
+  def _summarize(self, lo, hi):
+    hi = min(hi, len(self.tokenized_program) - 1)   # a function can start right past the last line
+    self.proven[lo:hi + 1] = [False] * (hi + 1 - lo)
+    self.types[lo:hi + 1] = [None] * (hi + 1 - lo)
+    self.errors = [error for error in self.errors if not lo <= error[0] <= hi]
+    outcomes = {}
+    for func_name in sorted(self._checks_looking_at(lo, hi), key=self._order.get):
+      first, last, results = self._results[func_name]
+      for offset, line_results in results.items():
+        if lo <= first + offset <= hi:
+          outcomes.setdefault(first + offset, []).extend(line_results)
+    for line_num, results in sorted(outcomes.items()):
+      owner = self.function_at(line_num) if self.on_demand else None
+      if owner is not None and owner not in self._order:
+        continue   # its function could run it unchecked
+      kinds = set(result[0] for result in results)
+      if kinds == {'ok'}:
+        self.proven[line_num] = True
+        expr_types = set(result[1] for result in results)
+        if len(expr_types) == 1:
+          self.types[line_num] = expr_types.pop()
+      elif kinds == {'error'} and len(set(result[1:] for result in results)) == 1:   # the same error in whatever order the checks ran
+        if self.short_circuit and ('&' in self.tokenized_program[line_num] or '|' in self.tokenized_program[line_num]):
+          continue   # the failing operand might never be evaluated
+        self.errors.append((line_num, results[0][1], results[0][2]))
+    self.errors.sort(key=lambda error: error[0])
+
+  # simulate one line on one scope stack: returns the outcome and the (line, stack) pairs that can follow
+  def _step(self, line_num, state):
+    tokens = self.tokenized_program[line_num]
+    if not tokens:
+      return ('ok', None), [(line_num + 1, state)]
+    args = tokens[1:]
+    try:
+      match tokens[0]:
+        case InterpreterBase.VAR_DEF:
+          return self._var(line_num, state, args)
+        case InterpreterBase.ASSIGN_DEF:
+          return self._assign(line_num, state, args)
+        case InterpreterBase.FUNCCALL_DEF:
+          return self._funccall(line_num, state, args)
+        case InterpreterBase.ENDFUNC_DEF:
+          return ('ok', None), []
+        case InterpreterBase.IF_DEF:
+          return self._if(line_num, state, args)
+        case InterpreterBase.ELSE_DEF:
+          return ('ok', None), self._jump(self._find_forward(line_num, [InterpreterBase.ENDIF_DEF]), [state])
+        case InterpreterBase.ENDIF_DEF:
+          return ('ok', None), self._next(line_num, self._pop_scope(state))
+        case InterpreterBase.RETURN_DEF:
+          return self._return(state, args), []
+        case InterpreterBase.WHILE_DEF:
+          return self._while(line_num, state, args)
+        case InterpreterBase.ENDWHILE_DEF:
+          return ('ok', None), self._jump(self._find_while(line_num), self._pop_scope(state), 0)
+        case default:
+          return (UNKNOWN,), []
+    except _Error as e:
+      return ('error', e.error_type, e.description), []
+
+  def _var(self, line_num, state, args):
+    if len(args) < 2 or args[0] not in DECLARED_CLASS:
+      return (UNKNOWN,), []
+    if SOME in state[-1]:
+      return (UNKNOWN,), self._next(line_num, self._declare(state, args[0], args[1:]))
+    top = state[-1]
+    declared = set()
+    for var in args[1:]:
+      if var in top or var in declared:
+        raise _Error(ErrorType.NAME_ERROR, f"Redefined variable {var}")
+      if OPEN in top:
+        return (UNKNOWN,), self._next(line_num, self._declare(state, args[0], args[1:]))
+      declared.add(var)
+    return ('ok', None), self._next(line_num, self._declare(state, args[0], args[1:]))
+
+  # declaring only touches the innermost copy of a repeated scope, the other copies stay behind it
+  def _declare(self, state, type_name, names):
+    top = state[-1]
+    names = dict.fromkeys(names, DECLARED_CLASS[type_name])
+    if SOME in top:
+      widened = self._merge([top, names])
+      return [state[:-1] + (widened,)] + self._declare(state[:-1], type_name, names)
+    declared = self._changed(self._content(top), names)
+    if MANY not in top:
+      return [state[:-1] + (declared,)]
+    below = self._changed(self._content(top), {MANY: max(top[MANY] - 1, 1)})
+    states = [state[:-1] + (below, declared)]
+    if top[MANY] == 1:
+      states.append(state[:-1] + (declared,))
+    return states
+
+  def _assign(self, line_num, state, args):
+    if len(args) < 2:
+      return (UNKNOWN,), []
+    next_states = self._next(line_num, [state])
+    try:
+      target = self._get_class(state, args[0])
+      value = self._eval(state, args[1:])
+    except _Unknown:
+      return (UNKNOWN,), next_states
+    if target == UNKNOWN or value == UNKNOWN:
+      return (UNKNOWN,), next_states
+    if target != value:
+      raise _Error(ErrorType.TYPE_ERROR, "Variable type and expression type do not match ")
+    return ('ok', value), next_states
+
+  def _funccall(self, line_num, state, args):
+    if not args:
+      return (UNKNOWN,), []
+    if args[0] == InterpreterBase.PRINT_DEF or args[0] == InterpreterBase.INPUT_DEF:
+      if args[0] == InterpreterBase.PRINT_DEF and len(args) < 2:
+        return (UNKNOWN,), []
+      after = [state] if args[0] == InterpreterBase.PRINT_DEF else [self._set_result(state, Type.STRING)]
+      try:
+        for arg in args[1:]:
+          self._get_class(state, arg)
+      except _Unknown:
+        return (UNKNOWN,), self._next(line_num, after)
+      return ('ok', None), self._next(line_num, after)
+    if args[0] == InterpreterBase.STRTOINT_DEF:
+      if len(args) != 2:
+        return (UNKNOWN,), []
+      after = self._next(line_num, [self._set_result(state, Type.INT)])
+      try:
+        value = self._get_class(state, args[1])
+      except _Unknown:
+        return (UNKNOWN,), after
+      if value == UNKNOWN:
+        return (UNKNOWN,), after
+      if value != Type.STRING:
+        raise _Error(ErrorType.TYPE_ERROR, "Non-string passed to strtoint")
+      return ('ok', None), after
+    return self._user_call(line_num, state, args[0], args[1:])
+
+  def _set_result(self, state, result_class):
+    if state[0].get(RESULT_NAMES[result_class]) == result_class:
+      return state
+    return (self._changed(state[0], {RESULT_NAMES[result_class]: result_class}),) + state[1:]
+
+  def _user_call(self, line_num, state, func_name, actuals):
+    func_info = self.func_manager.get_function_info(func_name)
+    if func_info is None:
+      raise _Error(ErrorType.NAME_ERROR, f"Unable to locate {func_name} function")
+    decided = True   # False once an earlier argument might already have raised
+    copied_back = {}
+    for i, para in enumerate(actuals):
+      try:
+        value = self._get_class(state, para)
+      except _Unknown:
+        decided, value = False, UNKNOWN
+      except _Error:
+        if decided:
+          raise
+        return (UNKNOWN,), []
+      if i >= len(func_info.inputs):
+        return (UNKNOWN,), []
+      formal = self._param_class(func_info.inputs[i][1])
+      if value == UNKNOWN or formal == UNKNOWN:
+        decided = False
+      elif value != formal:
+        if decided:
+          raise _Error(ErrorType.TYPE_ERROR, f"Mismatching types {value} and {formal}")
+        return (UNKNOWN,), []
+      if self._param_type(func_info.inputs[i][1]) in REF_TYPES and self._literal_class(para) is None:
+        copied_back[para] = value   # update_references copies the caller's Value into its outermost scope
+    outer = state[0]
+    if self._havoc:
+      leaked = dict.fromkeys(outer, UNKNOWN)
+      leaked.update(dict.fromkeys(copied_back, UNKNOWN))
+      leaked[OPEN] = UNKNOWN
+      if RETURN_VAR in outer:
+        leaked[RETURN_VAR] = outer[RETURN_VAR]
+      outer = self._scope(leaked)
+    elif copied_back:
+      outer = self._changed(outer, copied_back)
+    after_call = (outer,) + state[1:]
+    successors = [after_call]
+    return_class = self._return_class(func_info)
+    if return_class != InterpreterBase.VOID_DEF:
+      if return_class == UNKNOWN:
+        return (UNKNOWN,), []
+      successors.append(self._set_result(after_call, return_class))   # only set if the callee hits a return
+    return ('ok', None) if decided else (UNKNOWN,), self._next(line_num, successors)
+
+  def _if(self, line_num, state, args):
+    if not args:
+      return (UNKNOWN,), []
+    outcome = self._condition(state, args, "Non-boolean if expression")
+    nested = self._push_scope(state)
+    successors = self._next(line_num, [nested])
+    successors += self._jump(self._find_forward(line_num, [InterpreterBase.ENDIF_DEF, InterpreterBase.ELSE_DEF]), [nested])
+    return outcome, successors
+
+  def _while(self, line_num, state, args):
+    if not args:
+      return (UNKNOWN,), []
+    outcome = self._condition(state, args, "Non-boolean while expression")
+    successors = self._next(line_num, [self._push_scope(state)])
+    successors += self._jump(self._find_endwhile(line_num), [state])
+    return outcome, successors
+
+  def _condition(self, state, args, description):
+    try:
+      value = self._eval(state, args)
+    except _Unknown:
+      return (UNKNOWN,)
+    if value == UNKNOWN:
+      return (UNKNOWN,)
+    if value != Type.BOOL:
+      raise _Error(ErrorType.TYPE_ERROR, description)
+    return ('ok', value)
+
+  def _return(self, state, args):
+    result_var = state[0].get(RETURN_VAR)
+    if result_var is None:
+      raise _Error(ErrorType.NAME_ERROR, f"Unknown variable {RESERVED_RESULT}")
+    if result_var == InterpreterBase.VOID_DEF:
+      if args:
+        raise _Error(ErrorType.TYPE_ERROR, "Return type incompatible with function declaration")
+      return ('ok', None)
+    if result_var == UNKNOWN:
+      return (UNKNOWN,)
+    if not args:
+      return ('ok', result_var)
+    try:
+      value = self._eval(state, args)
+    except _Unknown:
+      return (UNKNOWN,)
+    if value == UNKNOWN:
+      return (UNKNOWN,)
+    if value != result_var:
+      raise _Error(ErrorType.TYPE_ERROR, "Return type incompatible with function declaration")
+    return ('ok', value)
+
+  # mirrors _eval_expression: operands are evaluated right to left, errors surface in that order
+  def _eval(self, state, tokens):
+    stack = []
+    for token in reversed(tokens):
+      if token in BINARY_OPS:
+        if len(stack) < 2:
+          raise _Unknown()
+        v1 = stack.pop()
+        v2 = stack.pop()
+        if v1 == UNKNOWN or v2 == UNKNOWN:
+          raise _Unknown()
+        if v1 != v2:
+          raise _Error(ErrorType.TYPE_ERROR, f"Mismatching types {v1} and {v2}")
+        if token not in BINARY_RESULTS[v1]:
+          raise _Error(ErrorType.TYPE_ERROR, f"Operator {token} is not compatible with {v1}")
+        stack.append(BINARY_RESULTS[v1][token])
+      elif token == '!':
+        if not stack or stack[-1] == UNKNOWN:
+          raise _Unknown()
+        if stack[-1] != Type.BOOL:
+          raise _Error(ErrorType.TYPE_ERROR, f"Expecting boolean for ! {stack[-1]}")
+      else:
+        stack.append(self._get_class(state, token))
+    if len(stack) != 1:
+      raise _Unknown()   # a syntax error, which we leave to the interpreter
+    return stack[0]
+
+  # mirrors _get_value: literals first, then a scope walk from the innermost block outwards
+  def _get_class(self, state, token):
+    literal = self._literal_class(token)
+    if literal is not None:
+      return literal
+    return self._lookup(state, token)
+
+  def _lookup(self, state, name):
+    for index in range(len(state) - 1, -1, -1):
+      scope = state[index]
+      value = scope.get(name, MISSING)
+      if value is not MISSING and SOME in scope:
+        try:
+          below = self._lookup(state[:index], name)
+        except _Error:
+          raise _Unknown()   # only there if the summarized scopes really hold it
+        return below if below == value else UNKNOWN
+      if value is not MISSING:
+        return value
+      if OPEN in scope:
+        raise _Unknown()
+    raise _Error(ErrorType.NAME_ERROR, f"Unknown variable {name}")
+
+  def _literal_class(self, token):
+    if token[0] == '"':
+      return Type.STRING
+    if token.isdigit() or token[0] == '-':
+      try:
+        int(token)
+      except ValueError:
+        raise _Unknown()
+      return Type.INT
+    if token == InterpreterBase.TRUE_DEF or token == InterpreterBase.FALSE_DEF:
+      return Type.BOOL
+    return None
+
+  # the names of scope, without its MANY or SOME marker
+  def _content(self, scope):
+    if MANY not in scope and SOME not in scope:
+      return scope
+    if scope.content is None:
+      scope.content = self._scope((name, value) for name, value in scope.items() if name != MANY and name != SOME)
+    return scope.content
+
+  # the scope holding items
+  def _scope(self, items):
+    base = dict(items)
+    return self._intern({}, base, functools.reduce(operator.xor, map(hash, base.items()), 0))
+
+  # scope with the names in changes set to their values
+  def _changed(self, scope, changes):
+    scope_hash = scope.hash
+    unchanged = True
+    for item in changes.items():
+      old = scope.get(item[0], MISSING)
+      if old is MISSING or old != item[1]:
+        unchanged = False
+        if old is not MISSING:
+          scope_hash ^= hash((item[0], old))
+        scope_hash ^= hash(item)
+    if unchanged:
+      return scope
+    top = {**scope.top, **changes}
+    if len(top) > MIN_TOP and len(top) ** 2 > len(scope.base):
+      return self._intern({}, {**scope.base, **top}, scope_hash)
+    return self._intern(top, scope.base, scope_hash)
+
+  # the one scope with these contents
+  def _intern(self, top, base, scope_hash):
+    same_hash = self._scopes.setdefault(scope_hash, [])
+    if same_hash:
+      contents = {**base, **top}
+      for scope in same_hash:
+        if scope.as_dict() == contents:
+          return scope
+    scope = _Scope(top, base, scope_hash)
+    same_hash.append(scope)
+    return scope
+
+  # a SOME scope holding every name of the given scopes, with conflicting types widened to UNKNOWN
+  def _merge(self, scopes):
+    merged = {SOME: True}
+    for scope in scopes:
+      for name, value in scope.items():
+        if name != MANY and name != SOME:
+          merged[name] = value if merged.get(name, value) == value else UNKNOWN
+    return self._scope(merged)
+
+  def _push_scope(self, state):
+    return self._normalize(state + (EMPTY,))
+
+  # popping one copy of a repeated scope may or may not uncover the scope below it
+  def _pop_scope(self, state):
+    top = state[-1]
+    if len(state) <= 1:
+      return []   # only an approximated stack can get here: endif/endwhile always follow their own push
+    if SOME in top:
+      return [state] + self._pop_scope(state[:-1])
+    if MANY not in top:
+      return [state[:-1]]
+    remaining = self._changed(self._content(top), {MANY: max(top[MANY] - 1, 1)})
+    states = [state[:-1] + (remaining,)]
+    if top[MANY] == 1:
+      states.append(state[:-1])
+    return states
+
+  # adjacent block scopes with the same contents collapse into one counted entry, which keeps loops that
+  # leak a scope per iteration (if without else, while with if/else inside) down to a finite set of stacks
+  def _normalize(self, state):
+    if len(state) == 1 or state in self._normal:
+      return state
+    if len(state) > MAX_DEPTH:
+      state = (state[0], self._merge(state[1:-KEEP_DEPTH])) + state[-KEEP_DEPTH:]
+    normalized = [state[0]]
+    for scope in state[1:]:
+      if len(normalized) > 1 and (SOME in normalized[-1]) != (SOME in scope):
+        normalized.append(scope)
+      elif len(normalized) > 1 and SOME in scope:
+        normalized[-1] = self._merge([normalized[-1], scope])
+      elif len(normalized) > 1 and self._content(normalized[-1]) is self._content(scope):
+        normalized[-1] = self._changed(self._content(scope), {MANY: min(normalized[-1].get(MANY, 1) + scope.get(MANY, 1), MAX_COPIES)})
+      else:
+        normalized.append(scope)
+    normalized = tuple(normalized)
+    self._normal.add(normalized)
+    return normalized
+
+  def _next(self, line_num, states):
+    return [(line_num + 1, self._normalize(state)) for state in states]
+
+  def _jump(self, target, states, offset=1):
+    if target is None:
+      return []
+    return [(target + offset, self._normalize(state)) for state in states]
+
+  # the same forward scans _if and _else do at runtime
+  def _find_forward(self, line_num, closers):
+    for cur_line in range(line_num + 1, len(self.tokenized_program)):
+      tokens = self.tokenized_program[cur_line]
+      if tokens and tokens[0] in closers and self.indents[line_num] == self.indents[cur_line]:
+        self._scanned[1] = max(self._scanned[1], cur_line)
+        return cur_line
+    self._scanned[1] = len(self.tokenized_program) - 1
+    return None
+
+  # the same scans _exit_while and _endwhile do; a blank line stops them just like the IndexError would
+  def _find_endwhile(self, line_num):
+    for cur_line in range(line_num + 1, len(self.tokenized_program)):
+      self._scanned[1] = max(self._scanned[1], cur_line)
+      tokens = self.tokenized_program[cur_line]
+      if not tokens:
+        return None
+      if tokens[0] == InterpreterBase.ENDWHILE_DEF and self.indents[cur_line] == self.indents[line_num]:
+        return cur_line
+      if self.indents[cur_line] < self.indents[line_num]:
+        return None
+    return None
+
+  def _find_while(self, line_num):
+    for cur_line in range(line_num - 1, -1, -1):
+      self._scanned[0] = min(self._scanned[0], cur_line)
+      tokens = self.tokenized_program[cur_line]
+      if not tokens:
+        return None
+      if tokens[0] == InterpreterBase.WHILE_DEF and self.indents[cur_line] == self.indents[line_num]:
+        return cur_line
+      if self.indents[cur_line] < self.indents[line_num]:
+        return None
+    return None
@@ -0,0 +1,150 @@
+import struct
+import sys
+from array import array
+from intbase import InterpreterBase
+from tokenize import Tokenizer
+from lazy_v2 import Unloaded
+
+# opcode of a line is the index of its keyword here; blank lines are 0 and lines that start with anything
+# else are OTHER, with that first token kept as an operand
+OPCODES = [None, InterpreterBase.FUNC_DEF, InterpreterBase.ENDFUNC_DEF, InterpreterBase.VAR_DEF,
+           InterpreterBase.ASSIGN_DEF, InterpreterBase.FUNCCALL_DEF, InterpreterBase.IF_DEF, InterpreterBase.ELSE_DEF,
+           InterpreterBase.ENDIF_DEF, InterpreterBase.WHILE_DEF, InterpreterBase.ENDWHILE_DEF, InterpreterBase.RETURN_DEF]
+OTHER = 255
+OPCODE_OF = dict((keyword, opcode) for opcode, keyword in enumerate(OPCODES) if keyword is not None)
+FUNC = OPCODE_OF[InterpreterBase.FUNC_DEF]
+MAGIC = b'BRWC\x01'
+HEADER = struct.Struct('<4Q')   # lines, operands, bytes of names, bytes of constants
+
+# CompactProgram holds a tokenized program as a few flat arrays instead of a list of lists of strs: one
+# opcode byte per line, every line's operands in one array of ints that index the tables of distinct
+# names and constants (so each spelling is stored once), and where each line's operands start. Token
+# lists are decoded from it as the interpreter needs them, and to_bytes gives a form that is cheap to
+# cache on disk or hand to another process.
+class CompactProgram:
+  def __init__(self, opcodes, indents, starts, operands, names, constants):
+    self.opcodes = opcodes        # array('B'), one per line
+    self.indents = indents        # array('I'), one per line
+    self.starts = starts          # array('I'), line i's operands are operands[starts[i]:starts[i + 1]]
+    self.operands = operands      # array('i'), n >= 0 is names[n] and n < 0 is constants[~n]
+    self.names = names            # keywords, identifiers, operators and types
+    self.constants = constants    # int, bool and string literals
+    self.tokenized_program = None
+
+  def __len__(self):
+    return len(self.opcodes)
+
+  # a fresh token list for a line
+  def line(self, line_num):
+    names, constants = self.names, self.constants
+    tokens = [names[n] if n >= 0 else constants[~n] for n in self.operands[self.starts[line_num]:self.starts[line_num + 1]]]
+    opcode = self.opcodes[line_num]
+    if opcode and opcode != OTHER:
+      return [OPCODES[opcode]] + tokens
+    return tokens
+
+  def header_lines(self):
+    return [line_num for line_num, opcode in enumerate(self.opcodes) if opcode == FUNC]
+
+  # the token lists of every line, for the interpreter to run; decoded right away, or with lazy as
+  # Unloaded placeholders that are decoded when first used
+  def tokenize(self, lazy=False):
+    if lazy:
+      self.tokenized_program = [Unloaded(self, line_num) for line_num in range(len(self))]
+    else:
+      self.tokenized_program = [self.line(line_num) for line_num in range(len(self))]
+    return self.tokenized_program
+
+  def load(self, line_num):
+    tokens = self.tokenized_program[line_num]
+    if type(tokens) is Unloaded:
+      tokens = self.tokenized_program[line_num] = self.line(line_num)
+    return tokens
+
+  def to_bytes(self):
+    names = '\n'.join(self.names).encode()
+    constants = '\n'.join(self.constants).encode()
+    parts = [MAGIC, HEADER.pack(len(self), len(self.operands), len(names), len(constants))]
+    for values in (self.opcodes, self.indents, self.starts, self.operands):
+      if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+      parts.append(values.tobytes())
+    return b''.join(parts + [names, constants])
+
+  # pickles (and so multiprocessing) send the flat bytes rather than the objects
+  def __reduce__(self):
+    return (from_bytes, (self.to_bytes(),))
+
+# tokenize program (a list of source lines) straight into a CompactProgram; no token lists are kept.
+# Errors give line numbers counted from first_line.
+def encode(program, first_line=0):
+  opcodes, indents, starts, operands = array('B'), array('I'), array('I', [0]), array('i')
+  names, constants = [], []
+  index = {}   # token -> its operand
+  for line_num, line in enumerate(program, first_line):
+    tokens = Tokenizer._tokenize(line_num, line.rstrip())
+    indents.append(len(line) - len(line.lstrip(' ')))
+    opcode = OPCODE_OF.get(tokens[0], OTHER) if tokens else 0
+    opcodes.append(opcode)
+    for token in tokens[1:] if opcode != OTHER else tokens:
+      n = index.get(token)
+      if n is None:
+        if _is_constant(token):
+          n = ~len(constants)
+          constants.append(token)
+        else:
+          n = len(names)
+          names.append(token)
+        index[token] = n
+      operands.append(n)
+    starts.append(len(operands))
+  return CompactProgram(opcodes, indents, starts, operands, names, constants)
+
+# one CompactProgram of all the lines of parts, in order. Each part's operands are translated to the
+# joined tables through a list that maps name n to position n and constant ~n to position ~n (from the end).
+def join(parts):
+  opcodes, indents, starts, operands = array('B'), array('I'), array('I', [0]), array('i')
+  names, constants = [], []
+  index = {}
+  def operand(token, constant):
+    n = index.get(token)
+    if n is None:
+      if constant:
+        n = ~len(constants)
+        constants.append(token)
+      else:
+        n = len(names)
+        names.append(token)
+      index[token] = n
+    return n
+  for part in parts:
+    translate = [operand(name, False) for name in part.names] + [operand(constant, True) for constant in reversed(part.constants)]
+    opcodes.extend(part.opcodes)
+    indents.extend(part.indents)
+    starts.extend(map(len(operands).__add__, part.starts[1:]))
+    operands.extend(map(translate.__getitem__, part.operands))
+  return CompactProgram(opcodes, indents, starts, operands, names, constants)
+
+def _is_constant(token):
+  return token[0] == '"' or token.lstrip('-').isdigit() or token in (InterpreterBase.TRUE_DEF, InterpreterBase.FALSE_DEF)
+
+# rebuild a CompactProgram from what to_bytes returned
+def from_bytes(data):
+  if data[:len(MAGIC)] != MAGIC:
+    raise ValueError("Not a compact Brewin program")
+  offset = len(MAGIC)
+  lines, operand_count, names_size, constants_size = HEADER.unpack_from(data, offset)
+  offset += HEADER.size
+  values = []
+  for typecode, count in (('B', lines), ('I', lines), ('I', lines + 1), ('i', operand_count)):
+    part = array(typecode)
+    part.frombytes(data[offset:offset + count * part.itemsize])
+    if sys.byteorder == 'big':
+      part.byteswap()
+    offset += count * part.itemsize
+    values.append(part)
+  names = data[offset:offset + names_size].decode().split('\n') if names_size else []
+  offset += names_size
+  constants = data[offset:offset + constants_size].decode().split('\n') if constants_size else []
+  return CompactProgram(*values, names, constants)
@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+from intbase import InterpreterBase
+from tokenize import Tokenizer
+from interpreterv1 import Interpreter as InterpreterV1
+from interpreterv2 import Interpreter
+
+# Runs a corpus of Brewin programs through every engine and checks that they agree: each engine's
+# get_output() and get_error_type_and_line() (and the Python exception, if one escaped that wasn't a
+# Brewin error) must be exactly what the reference engine, v2, gave. Runs are timed and every engine's
+# total is reported against v2's. v1 only understands the Project 1 language, so it is only given
+# programs in the subset both versions read the same way. Modes that change what a program does on
+# purpose (short_circuit, fail_fast) aren't engines.
+
+REFERENCE = 'v2'
+ENGINES = {
+  'v1': lambda input: InterpreterV1(False, input),
+  'v2': lambda input: Interpreter(False, input),
+  'v2 lazy': lambda input: Interpreter(False, input, lazy=True),
+  'v2 compact': lambda input: Interpreter(False, input, compact=True),
+  'v2 lazy compact': lambda input: Interpreter(False, input, lazy=True, compact=True),
+  'v2 parallel': lambda input: Interpreter(False, input, parallel=True),
+  'v2 fast paths': lambda input: Interpreter(False, input, fast_paths=True),
+}
+V1_ONLY_NAMES = {InterpreterBase.RESULT_DEF}
+V2_ONLY_NAMES = {InterpreterBase.VAR_DEF, 'resulti', 'resultb', 'results'}
+
+# Comparison holds the outcomes and timings of one corpus run; see report()
+class Comparison:
+  def __init__(self, engines):
+    self.engines = engines
+    self.times = dict((engine, 0.0) for engine in engines)
+    self.reference_times = dict((engine, 0.0) for engine in engines)  # v2's time on the programs engine ran
+    self.runs = dict((engine, 0) for engine in engines)
+    self.mismatches = []  # (program name, engine, engine's outcome, v2's outcome)
+
+  def report(self, out=sys.stdout):
+    for name, engine, outcome, expected in self.mismatches:
+      print(f"MISMATCH {name} [{engine}]", file=out)
+      print(f"  {REFERENCE}: {_describe(expected)}", file=out)
+      print(f"  {engine}: {_describe(outcome)}", file=out)
+    print(f"{'engine':<18}{'programs':>9}{'seconds':>10}{'speedup':>9}", file=out)
+    for engine in self.engines:
+      speedup = self.reference_times[engine] / self.times[engine] if self.times[engine] else 0
+      print(f"{engine:<18}{self.runs[engine]:>9}{self.times[engine]:>10.3f}{speedup:>8.2f}x", file=out)
+    print(f"{len(self.mismatches)} mismatches", file=out)
+
+# run every (name, program, input) of corpus through engines (names from ENGINES, v2 always included),
+# timing the best of repeat runs, and return the Comparison
+def compare(corpus, engines=None, repeat=1):
+  engines = [REFERENCE] + [engine for engine in engines or ENGINES if engine != REFERENCE]
+  comparison = Comparison(engines)
+  for name, program, input in corpus:
+    expected, reference_time = _run(ENGINES[REFERENCE], program, input, repeat)
+    for engine in engines:
+      if engine == 'v1' and not is_v1_program(program):
+        continue
+      if engine == REFERENCE:
+        outcome, seconds = expected, reference_time
+      else:
+        outcome, seconds = _run(ENGINES[engine], program, input, repeat)
+      comparison.times[engine] += seconds
+      comparison.reference_times[engine] += reference_time
+      comparison.runs[engine] += 1
+      if outcome != expected:
+        comparison.mismatches.append((name, engine, outcome, expected))
+  return comparison
+
+# whether program only uses what v1 and v2 both read the same way: no declarations, no typed functions
+# or parameters, and no result variables (v1 has one untyped result, v2 one per type)
+def is_v1_program(program):
+  for line_num, line in enumerate(program):
+    tokens = Tokenizer._tokenize(line_num, line.rstrip())
+    if not tokens:
+      continue
+    if tokens[0] == InterpreterBase.FUNC_DEF and len(tokens) != 2:
+      return False
+    if V1_ONLY_NAMES.intersection(tokens) or V2_ONLY_NAMES.intersection(tokens):
+      return False
+  return True
+
+# the outcome of running program on a fresh interpreter, and the fastest of repeat runs in seconds
+def _run(make, program, input, repeat):
+  best = None
+  for _ in range(repeat):
+    interpreter = make(list(input) if input is not None else None)
+    escaped = None
+    start = time.perf_counter()
+    try:
+      interpreter.run(program)
+    except Exception as e:
+      if interpreter.get_error_type_and_line()[0] is None:
+        escaped = type(e).__name__
+    seconds = time.perf_counter() - start
+    best = seconds if best is None else min(best, seconds)
+  return (list(interpreter.get_output()), interpreter.get_error_type_and_line(), escaped), best
+
+def _describe(outcome):
+  output, (error_type, error_line), escaped = outcome
+  error = f"{error_type} on line {error_line}" if error_type else "no error"
+  if escaped:
+    error += f", {escaped} escaped"
+  return f"output {output}, {error}"
+
+# the .brewin programs under path (a file or a directory), each with the input lines from the .in file
+# beside it, if there is one
+def load_corpus(path):
+  paths = [path] if os.path.isfile(path) else sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.brewin'))
+  corpus = []
+  for program_path in paths:
+    with open(program_path) as f:
+      program = f.read().splitlines()
+    input_path = os.path.splitext(program_path)[0] + '.in'
+    input = None
+    if os.path.exists(input_path):
+      with open(input_path) as f:
+        input = f.read().splitlines()
+    corpus.append((os.path.basename(program_path), program, input))
+  return corpus
+
+if __name__ == "__main__":
+  if len(sys.argv) not in (2, 3):
+    print("usage: python compare_v2.py programs_dir [repeat]")
+    sys.exit(1)
+  comparison = compare(load_corpus(sys.argv[1]), repeat=int(sys.argv[2]) if len(sys.argv) == 3 else 1)
+  comparison.report()
+  sys.exit(1 if comparison.mismatches else 0)
@@ -6,6 +6,7 @@ class EnvironmentManager:
   def __init__(self):
     self.environment = [[{}]] # list of list of dictionaries
     # where outer list is function scopes, inner list is block scopes, dictionary contains the variables
+    self.return_vars = [None] # per function scope, the Value (or 'void') its function returns by default; main has none
 
   def __str__(self):
     s = ""
@@ -42,17 +43,26 @@ class EnvironmentManager:
     else:
       self.environment[func_scope][0].update({symbol:value})
     
+  # resulti, resultb and results always go in a function scope's outermost dictionary
+  def set_result(self, symbol, value, func_scope=-1):
+    self.environment[func_scope][0][symbol] = value
+
+  def get_result(self, symbol):
+    return self.environment[-1][0].get(symbol)
+
   def update_references(self):
     for env in self.environment[-1][::-1]:
       for v in env.values():
         if v!= 'void' and v.r is not None:
           self.set(v.ref_var(), v.ref_info().update_only_val(v.value()), -2)
 
-  def new_func_scope(self, params={}):
+  def new_func_scope(self, params={}, return_var=None):
     self.environment.append([params])
+    self.return_vars.append(return_var)
   
   def pop_env(self):
     self.environment.pop()
+    self.return_vars.pop()
   
   def nest_new_scope(self):
     self.environment[-1].append({})
@@ -0,0 +1,67 @@
+from interpreterv2 import Interpreter
+from intbase import InterpreterBase
+import multiprocessing
+
+parent_interpreter = None   # the interpreter run_batch is forking workers from
+
+# Running one program against many sets of input repeats everything main does before its first input
+# statement, which can't depend on the input. run_batch runs that prefix once, snapshots the state right
+# before the first input statement, and carries on from the snapshot once per input set, in a pool of
+# forked processes if asked. Limits apply to the prefix and, afresh, to every continuation; hooks only
+# see the continuations.
+
+# run program with every list of input lines in input_sets and return, for each one in order, the
+# (output lines, exception or None) the run would have ended with
+def run_batch(program, input_sets, processes=1, **interpreter_args):
+  interpreter = Interpreter(**dict({'console_output': False}, **interpreter_args))
+  try:
+    interpreter._start(program)
+    at_input = _run_to_first_input(interpreter)
+  except Exception as exception:
+    return [(list(interpreter.get_output()), exception) for _ in input_sets]
+  if not at_input:
+    return [(list(interpreter.get_output()), None) for _ in input_sets]
+  state = interpreter.snapshot()
+  if processes == 1 or len(input_sets) < 2:
+    return [_continue(interpreter, state, input_set) for input_set in input_sets]
+  global parent_interpreter
+  parent_interpreter = interpreter   # forked workers inherit it, compiled, and restore the state into it
+  try:
+    context = multiprocessing.get_context('fork')
+    with context.Pool(processes, _start_worker, (state,)) as pool:
+      return pool.map(_continue_in_worker, input_sets, chunksize=max(1, len(input_sets) // (processes * 8)))
+  finally:
+    parent_interpreter = None
+
+# execute statements up to (not including) the first input statement; False if main returned before one
+def _run_to_first_input(interpreter):
+  stopped = []
+  def step():
+    tokens = interpreter.tokenized_program[interpreter.ip]
+    if len(tokens) > 1 and tokens[0] == InterpreterBase.FUNCCALL_DEF and tokens[1] == InterpreterBase.INPUT_DEF:
+      stopped.append(interpreter.ip)
+      interpreter.terminate = True
+      return
+    interpreter._process_line()
+  if interpreter.limits:
+    interpreter._run_governed(step)
+  else:
+    while not interpreter.terminate:
+      step()
+  interpreter.terminate = False
+  return bool(stopped)
+
+def _continue(interpreter, state, input_set):
+  try:
+    interpreter.resume(state, input_set)
+    return list(interpreter.get_output()), None
+  except Exception as exception:
+    return list(interpreter.get_output()), exception
+
+def _start_worker(state):
+  global worker_interpreter, worker_state
+  worker_interpreter = parent_interpreter
+  worker_state = state
+
+def _continue_in_worker(input_set):
+  return _continue(worker_interpreter, worker_state, input_set)
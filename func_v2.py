@@ -17,17 +17,36 @@ class FuncInfo:
 # FunctionManager keeps track of every function in the program, mapping the function name
 # to a FuncInfo object (which has the starting line number/instruction pointer) of that function.
 class FunctionManager:
-  def __init__(self, tokenized_program):
+  # header_lines, if given, are the only lines that can be function headers, so no other line is looked at
+  def __init__(self, tokenized_program, header_lines=None):
     self.func_cache = {}
-    self._cache_function_info(tokenized_program)
+    self._cache_function_info(tokenized_program, header_lines)
 
   def get_function_info(self, func_name):
     if func_name not in self.func_cache:
       return None
     return self.func_cache[func_name]
 
-  def _cache_function_info(self, tokenized_program):
-    for line_num, line in enumerate(tokenized_program):
+  # Lines start up to old_end, which held old_lines, were replaced by lines start up to new_end of
+  # tokenized_program. Functions after the edit just move; if a function header was added, removed or
+  # changed the whole table is rebuilt. Returns whether that happened, i.e. whether signatures may differ.
+  def patch(self, tokenized_program, start, old_end, new_end, old_lines):
+    changed_lines = old_lines + tokenized_program[start:new_end]
+    if any(line and line[0] == InterpreterBase.FUNC_DEF for line in changed_lines):
+      self.func_cache = {}
+      self._cache_function_info(tokenized_program)
+      return True
+    if new_end != old_end:
+      for func_info in self.func_cache.values():
+        if func_info.start_ip > old_end:
+          func_info.start_ip += new_end - old_end
+    return False
+
+  def _cache_function_info(self, tokenized_program, header_lines=None):
+    if header_lines is None:
+      header_lines = range(len(tokenized_program))
+    for line_num in header_lines:
+      line = tokenized_program[line_num]
       if line and line[0] == InterpreterBase.FUNC_DEF:
         func_name = line[1]
         input_values = [(name,self._get_value_type(val)) for name, val in [input.split(":") for input in line[2:-1]]]
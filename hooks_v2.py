@@ -0,0 +1,90 @@
+import sys
+from collections import deque
+
+# Hooks is the surface tracers, coverage collectors, debuggers and the profiler plug into. Subclass it
+# and override the events you care about; the interpreter only pays for the events someone overrides,
+# and runs its plain loop when no hooks are installed at all.
+class Hooks:
+  def on_start(self, interpreter):       # before the first line of interpreter.entry: main, or what call() entered
+    pass
+
+  def on_line(self, ip):                 # before the line at ip executes
+    pass
+
+  def on_call(self, name, ip, callee_ip):  # the funccall at ip just jumped into name at callee_ip
+    pass
+
+  def on_return(self, ip, return_ip):    # the return/endfunc at ip just went back to return_ip
+    pass
+
+  def on_scope_push(self, ip, depth):    # an if/while at ip nested a block scope, depth is the new count
+    pass
+
+  def on_scope_pop(self, ip, depth):     # an endif/endwhile at ip removed a block scope
+    pass
+
+  def on_error(self, error_type, line_num, exception):  # the run is about to stop on an exception
+    pass
+
+  def on_finish(self):                   # the run is over, normally or not
+    pass
+
+# the bound event handlers of every hook that actually overrides the given event
+def handlers(hooks, event):
+  base = getattr(Hooks, event)
+  return [getattr(hook, event) for hook in hooks if getattr(type(hook), event, base) is not base]
+
+# Collects trace lines in memory and writes them to the stream (stdout by default, looked up at flush time
+# like print does) in batches rather than one print per line
+class BufferedSink:
+  def __init__(self, stream=None, batch_lines=4096):
+    self.stream = stream
+    self.batch_lines = batch_lines
+    self.pending = []
+
+  def write(self, text):
+    self.pending.append(text)
+    if len(self.pending) >= self.batch_lines:
+      self.flush()
+
+  def flush(self):
+    if self.pending:
+      (self.stream or sys.stdout).write('\n'.join(self.pending) + '\n')
+      self.pending = []
+
+# Keeps only the most recent trace lines, for looking at what led up to an error
+class RingBufferSink:
+  def __init__(self, size=1000):
+    self.lines = deque(maxlen=size)
+
+  def write(self, text):
+    self.lines.append(text)
+
+  def flush(self):
+    pass
+
+# Writes every executed line to a sink, in the same "0012: source" format trace_output always used
+class LineTracer(Hooks):
+  def __init__(self, sink=None):
+    self.sink = sink if sink is not None else BufferedSink()
+
+  def on_start(self, interpreter):
+    self.program = interpreter.program
+
+  def on_line(self, ip):
+    self.sink.write(f"{ip:04}: {self.program[ip].rstrip()}")
+
+  def on_finish(self):
+    self.sink.flush()
+
+# Records which lines ran at least once
+class CoverageCollector(Hooks):
+  def __init__(self):
+    self.executed = set()
+
+  def on_line(self, ip):
+    self.executed.add(ip)
+
+  # zero-based line numbers of statements that never ran
+  def missed(self, tokenized_program):
+    return [ip for ip, tokens in enumerate(tokenized_program) if tokens and ip not in self.executed]
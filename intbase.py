@@ -5,6 +5,7 @@ class ErrorType(Enum):
   TYPE_ERROR = 1
   NAME_ERROR = 2    # if a variable or function name can't be found
   SYNTAX_ERROR = 3  # used for syntax errors
+  RESOURCE_ERROR = 4  # a run went past one of the limits it was given
   # Add others here
 
 
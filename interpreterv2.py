@@ -2,34 +2,502 @@ from intbase import InterpreterBase, ErrorType
 from env_v2 import EnvironmentManager
 from tokenize import Tokenizer
 from func_v2 import FunctionManager
-from val_v2 import Value, Type
+from val_v2 import Value, Type, Ref
+from check_v2 import StaticChecker, RESERVED_RESULT
+from profile_v2 import Profiler
+from hooks_v2 import LineTracer, handlers
+from trace_v2 import BinaryTracer
+from stats_v2 import RuntimeStats
+from memory_v2 import MemoryTracker
+from rope_v2 import concat
+from lazy_v2 import LazyLoader
+from source_v2 import MappedSource
+import compact_v2
+import parallel_v2
+import snapshot_v2
+import asyncio
 
 # Main interpreter class
 class Interpreter(InterpreterBase):
-  def __init__(self, console_output=True, input=None, trace_output=False):
+  CALL_RETURN = -1  # return address of a function entered through call(); reaching it ends the call
+  RESULT_NAMES = {'resulti', 'resultb', 'results'}
+  HOT = 32  # calls to a function, or trips round one of its loops, before fast_paths has it checked
+
+  def __init__(self, console_output=True, input=None, trace_output=False, fail_fast=False, short_circuit=False,
+               fast_paths=False, profile=False, hooks=None, stats=False, limits=None, lazy=False,
+               compact=False, parallel=False, memory=False, cache=None,
+               sampler=None, trace_file=None, function_cache=None):
     super().__init__(console_output, input)
-    self._setup_operations()  # setup all valid binary operations and the types they work on
     self.trace_output = trace_output
+    self.fail_fast = fail_fast  # report errors the static checker can prove before running anything
+    self.short_circuit = short_circuit  # skip the right operand of & and | once the left one decides
+    self.fast_paths = fast_paths  # have the static checker prove hot functions' lines so they skip their checks
+    self.hooks = list(hooks or [])  # Hooks objects watching every run, see hooks_v2
+    self.profiler = Profiler() if profile else None  # per-line and per-function timings, see profile_v2
+    if self.profiler:
+      self.hooks.append(self.profiler)
+    self.stats = RuntimeStats() if stats else None  # internal counters, read them with get_stats()
+    if self.stats:
+      self.hooks.append(self.stats)
+    self._new_value = self.stats.value_factory() if self.stats else Value  # makes every Value a run creates
+    self.memory = MemoryTracker() if memory else None  # allocations by line and function, see memory_v2
+    if self.memory:
+      self.hooks.append(self.memory)
+    if trace_output:
+      self.hooks.append(LineTracer())
+    if trace_file:
+      self.hooks.append(BinaryTracer(trace_file))  # binary records for trace_v2 to analyse
+    self.limits = limits  # a limits_v2.Limits capping statements, call depth, memory and time, or None
+    self.lazy = lazy  # only tokenize and check a function when it is first called, see lazy_v2
+    self.compact = compact  # keep the tokenized program as a compact_v2.CompactProgram
+    self.parallel = parallel  # run the front end in a pool of this many processes (True: one per core)
+    self.cache = cache  # a cache_v2.ResultCache that run() replays earlier outcomes from, or None
+    self.sampler = sampler  # a sampler_v2.SamplingProfiler that samples run() and resume(), or None
+    self.function_cache = function_cache  # a library_v2.FunctionCache to take already tokenized and checked functions from
+    self.program = None  # the program last run or loaded
+    self._setup_operations()  # setup all valid binary operations and the types they work on
+    if self.limits:
+      self.limits.guard_strings(self, self.binary_ops)
+
+  # start notifying hook (a hooks_v2.Hooks) about the events of every later run
+  def add_hook(self, hook):
+    self.hooks.append(hook)
+
+  # counters from the last run as a dict (None unless created with stats=True); see stats_v2 for JSON
+  def get_stats(self):
+    return self.stats.as_dict() if self.stats else None
 
   # run a program, provided in an array of strings, one string per line of source code
   def run(self, program):
-    self.program = program
-    self._compute_indentation(program)  # determine indentation of every line
-    self.tokenized_program = Tokenizer.tokenize_program(program)
-    self.func_manager = FunctionManager(self.tokenized_program)
-    self.ip = self._find_first_instruction(InterpreterBase.MAIN_FUNC)
-    self.return_stack = []
-    self.terminate = False
-    self.env_manager = EnvironmentManager() # used to track variables/scope
+    if self.cache and self._cacheable(program):
+      self._run_cached(program)
+      return
+    self._start(program)
+    self._execute()
+
+  # runs are only cached when nothing but the program and the input list decides what they do: no hooks
+  # are watching, no limits apply, and the program can't read from stdin. Only the lines that mention
+  # input are tokenized to look for an input call (of a mapped source, only those lines are decoded).
+  def _cacheable(self, program):
+    if self.hooks or self.limits:
+      return False
+    if self.input:
+      return True
+    if type(program) is MappedSource:
+      line_nums = program.lines_with(InterpreterBase.INPUT_DEF)
+    else:
+      line_nums = [line_num for line_num, line in enumerate(program) if InterpreterBase.INPUT_DEF in line]
+    for line_num in line_nums:
+      tokens = Tokenizer.tokenize_lines(program, line_num, line_num + 1)[0]
+      if tokens[:2] == [InterpreterBase.FUNCCALL_DEF, InterpreterBase.INPUT_DEF]:
+        return False
+    return True
+
+  # replay the stored outcome of an earlier identical run, output, error and all, without executing
+  # anything; otherwise run the program and store its outcome, unless a Python error that isn't a
+  # Brewin one escaped. The key has every option that can change the outcome: what fail_fast reports
+  # depends on whether the program is checked whole or a function at a time.
+  def _run_cached(self, program):
+    source = program if type(program) is MappedSource else list(program)
+    key = self.cache.key(source, self.input, [self.fail_fast, self.short_circuit, self._loads_lazily(program)])
+    cached = self.cache.get(key)
+    self.error_type = self.error_line = None
+    if cached:
+      output, error_type, error_line, message = cached
+      for line in output:
+        super().output(line)
+      if error_type:
+        self.error_type, self.error_line = error_type, error_line
+        raise Exception(message)
+      return
+    start = len(self.output_log)
+    try:
+      self._start(program)
+      self._execute()
+    except Exception as exception:
+      if self.error_type is not None:
+        self.cache.put(key, self.output_log[start:], self.error_type, self.error_line, str(exception))
+      raise
+    self.cache.put(key, self.output_log[start:], None, None)
+
+  # run the program in the file at path without reading it into a list: the file is memory-mapped (see
+  # source_v2) and loaded as lazy=True loads, so only the lines of the functions the run reaches are
+  # decoded and tokenized, and error line numbers are the ones run() gives for the file's lines
+  def run_file(self, path):
+    self.run(MappedSource(path))
+
+  # the state of the current run as bytes, for resume() to carry on from (see snapshot_v2)
+  def snapshot(self):
+    return snapshot_v2.snapshot(self)
+
+  # continue a run from a snapshot, possibly taken in another process, with the statement it stopped at;
+  # input, if given, replaces the input the run had and is read from its first line
+  def resume(self, snapshot, input=None):
+    snapshot_v2.restore(self, snapshot)
+    if input is not None:
+      self.input = input
+      self.input_cursor = 0
+    self._execute()
+
+  # execute statements until main returns
+  def _execute(self):
+    if self.sampler:
+      self.sampler.start(self)
+      try:
+        self._execute_loop()
+      finally:
+        self.sampler.stop()
+      return
+    self._execute_loop()
+
+  def _execute_loop(self):
+    if self.hooks:
+      self._run_hooked()
+      return
+    if self.limits:
+      self._run_governed(self._process_line)
+      return
 
     # main interpreter run loop
     while not self.terminate:
     #   print(self.env_manager)
       self._process_line()
 
+  # run program as a coroutine, for hosting many runs on one event loop (see scheduler_v2): the run gives
+  # the loop back every yield_every statements, and input statements await input_provider(), an async
+  # function returning the next line of input, instead of blocking. Without one, input comes from the
+  # input list or from stdin in a worker thread.
+  async def run_async(self, program, input_provider=None, yield_every=1024):
+    self._start(program)
+    read_input = input_provider or self._read_input
+    step = self._process_line
+    if self.hooks:
+      self._start_hooks()
+      step = self._hooked_line
+    if self.limits:
+      self.limits.start()
+    try:
+      while not self.terminate:
+        batch = min(yield_every, self.limits.batch()) if self.limits else yield_every
+        ran = 0
+        while ran < batch and not self.terminate:
+          tokens = self.tokenized_program[self.ip]
+          if len(tokens) > 1 and tokens[0] == InterpreterBase.FUNCCALL_DEF and tokens[1] == InterpreterBase.INPUT_DEF:
+            await self._input_async(tokens[2:], read_input)
+          else:
+            step()
+          ran += 1
+        if self.limits:
+          self.limits.check(self, ran)
+        await asyncio.sleep(0)
+    except Exception as exception:
+      if self.hooks:
+        self._error_hooks(exception)
+      raise
+    finally:
+      if self.hooks:
+        self._finish_hooks()
+
+  # funccall input, with the wait for the line handed to the event loop
+  async def _input_async(self, args, read_input):
+    if self.hooks:
+      for hook in self.on_line:
+        hook(self.ip)
+    if args:
+      self._print(args)
+    self._set_input_result(await read_input())
+    self._advance_to_next_statement()
+
+  async def _read_input(self):
+    if self.input:
+      return super().get_input()
+    return await asyncio.get_running_loop().run_in_executor(None, input)
+
+  # compile program and get ready to execute main's first line
+  def _start(self, program):
+    self._compile(program, False)
+    if self.fail_fast and self.checker.errors:
+      line_num, error_type, description = self.checker.first_error()
+      super().error(error_type, description, line_num)
+    self.entry = InterpreterBase.MAIN_FUNC  # the function this execution starts in, for the hooks
+    self.ip = None  # a missing main is no line's error, whatever an earlier run left here
+    self.ip = self._find_first_instruction(self.entry)
+    self.return_stack = []
+    self.terminate = False
+    self.env_manager = self._new_environment() # used to track variables/scope
+
+  # prepare a program for call() without running main; the front end work is done once per load
+  def load(self, program):
+    self._compile(program, True)
+
+  # tokenize and index program and run the static checker, if there is to be one; exported programs may
+  # also be entered at any function through call(), so the checker has to prove its lines for that too
+  def _compile(self, program, exported):
+    self.result_registers = self._results_in_registers(program)
+    self.inline_plans = {}  # function name -> how to run calls to it in place (see _inline_plan), or None
+    if self.lazy or self.compact or type(program) is MappedSource:
+      self._compile_once(program, exported)
+      return
+    if getattr(self, 'source', None) is not None and self.exported == exported:
+      self._recompile(program)
+      return
+    self.program = program
+    self.source = list(program)  # what was compiled, in case the caller edits program in place
+    checks = None
+    if self.function_cache:
+      checks = {}
+      self.tokenized_program, self.indents, headers = self.function_cache.front_end(program, checks)
+      self.func_manager = FunctionManager(self.tokenized_program, headers)
+    elif self.parallel:
+      self.tokenized_program, self.indents, headers = parallel_v2.front_end(program, self._processes())
+      self.func_manager = FunctionManager(self.tokenized_program, headers)
+    else:
+      self._compute_indentation(program)  # determine indentation of every line
+      self.tokenized_program = Tokenizer.tokenize_program(program)
+      self.func_manager = FunctionManager(self.tokenized_program)
+    self._check(exported, checks=checks)
+    self.exported = exported
+    self.expression_trees = {}  # ip -> parsed expression, only used when short circuiting
+
+  # run the static checker, if fail_fast or fast_paths asks for it; without one no line is proven and
+  # every line keeps its runtime checks. fail_fast has to check everything before the run starts, but
+  # for fast_paths alone a check only pays for itself on code that runs many times, so each function
+  # is checked once it is hot (see _warm); lazily loaded ones are checked on their first call anyway.
+  def _check(self, exported, lazy=False, checks=None):
+    if self.fail_fast or self.fast_paths:
+      self.checker = StaticChecker(self.tokenized_program, self.indents, self.func_manager, self.short_circuit,
+                                   exported, lazy, checks, not self.fail_fast and not lazy)
+      self.proven = self.checker.proven  # lines whose type checks are proven to pass
+    else:
+      self.checker = None
+      self.proven = [False] * len(self.tokenized_program)
+    later = self.checker is not None and (self.checker.lazy or self.checker.on_demand)
+    self.unchecked = set(self.func_manager.func_cache) if later else set()  # functions the checker has yet to look at
+    self.heat = {}  # calls to each unchecked function and trips round each loop, see _warm
+    self.hot = 1 if self.checker and self.checker.lazy else self.HOT
+
+  # calls, input and strtoint only ever put resulti, resultb and results in a function scope's outermost
+  # dictionary, so unless the program declares a variable or parameter by one of those names, reading one
+  # can go straight there instead of walking the block scopes
+  def _results_in_registers(self, program):
+    lines = (program[line_num] for line_num in program.lines_with('result')) if type(program) is MappedSource else program
+    for line in lines:
+      if 'result' in line:
+        words = line.split()
+        if words[0] in (InterpreterBase.VAR_DEF, InterpreterBase.FUNC_DEF) and any(word.split(':')[0] in self.RESULT_NAMES for word in words[1:]):
+          return False
+    return True
+
+  # the front end for lazy and compact programs, which keep nothing for _recompile. Lazily, only the
+  # function headers are indexed and each function's lines are tokenized and checked on its first call.
+  # Compact programs are encoded into a CompactProgram whose token lists share one str per spelling.
+  # Mapped sources are always loaded lazily.
+  def _compile_once(self, program, exported):
+    lazy = self._loads_lazily(program)
+    self.program = program
+    self.source = None
+    checks = None
+    if self.compact:
+      if self.function_cache:
+        checks = None if lazy else {}
+        self.compact_program = self.function_cache.encode(program, checks)
+      elif self.parallel:
+        self.compact_program = parallel_v2.encode(program, self._processes())
+      else:
+        self.compact_program = compact_v2.encode(program)
+      self.tokenized_program = self.compact_program.tokenize(lazy)
+      self.indents = self.compact_program.indents
+      headers = self.compact_program.header_lines()
+    else:
+      loader = LazyLoader(program)
+      self.tokenized_program = loader.tokenized_program
+      self.indents = loader.indents
+      headers = loader.headers
+    self.func_manager = FunctionManager(self.tokenized_program, headers)
+    self._check(exported, lazy, checks)
+    self.exported = exported
+    self.expression_trees = {}
+
+  def _loads_lazily(self, program):
+    return self.lazy or type(program) is MappedSource
+
+  # compile program by redoing the front end only for the lines that differ from the last compiled one:
+  # those lines are re-tokenized and spliced in, and the function table and checker patch themselves
+  def _recompile(self, program):
+    start, old_end, new_end = self._changed_lines(self.source, program)
+    self.program = program
+    self.source[start:old_end] = program[start:new_end]
+    if start == old_end == new_end:
+      return
+    old_lines = self.tokenized_program[start:old_end]
+    self.indents[start:old_end] = [self._indentation(line) for line in program[start:new_end]]
+    self.tokenized_program[start:old_end] = Tokenizer.tokenize_lines(program, start, new_end)
+    signatures_changed = self.func_manager.patch(self.tokenized_program, start, old_end, new_end, old_lines)
+    if self.checker and self.checker.on_demand:
+      self._check(self.exported)   # hot functions are found and checked again
+    elif self.checker:
+      self.checker.patch(start, old_end, new_end, old_lines, signatures_changed)
+    else:
+      self.proven[start:old_end] = [False] * (new_end - start)
+    self.expression_trees = {}
+
+  def _processes(self):
+    return None if self.parallel is True else self.parallel
+
+  # the smallest run of lines whose replacement turns old into new: lines start up to old_end of old
+  # became lines start up to new_end of new
+  def _changed_lines(self, old, new):
+    limit = min(len(old), len(new))
+    start = self._common_run(old, new, limit, lambda seq, same, step: seq[same:same + step])
+    same_end = self._common_run(old, new, limit - start,
+                                lambda seq, same, step: seq[len(seq) - same - step:len(seq) - same])
+    return start, len(old) - same_end, len(new) - same_end
+
+  # how many lines old and new share at one end, at most limit; part(seq, same, step) is the step lines
+  # next to the same ones. Comparing growing and then shrinking slices keeps the line by line work
+  # inside list comparison rather than in a Python loop.
+  def _common_run(self, old, new, limit, part):
+    same, step = 0, 1
+    while same + step <= limit and part(old, same, step) == part(new, same, step):
+      same += step
+      step *= 2
+    while step > 1:
+      step //= 2
+      if same + step <= limit and part(old, same, step) == part(new, same, step):
+        same += step
+    return same
+
+  def _new_environment(self):
+    return self.stats.environment() if self.stats else EnvironmentManager()
+
+  # call one function of the loaded program with Python ints, bools and strs, or Ref holders for ref
+  # parameters (their value is updated when the call returns). Returns what the function passed back in
+  # resulti, resultb or results, or None if it is void or ended without a return. The call runs in a
+  # fresh environment whose outermost frame stands in for the caller, and is executed the way run()
+  # executes main: under the limits, watched by the hooks and sampled by the sampler.
+  def call(self, name, *args):
+    if self.program is None:
+      raise ValueError("no program to call into; load() one first")
+    if not getattr(self, 'exported', False):
+      self.load(self.program)
+    func_info = self.func_manager.get_function_info(name)
+    if func_info == None:
+      super().error(ErrorType.NAME_ERROR,f"Unable to locate {name} function")
+    if len(args) != len(func_info.inputs):
+      super().error(ErrorType.TYPE_ERROR,f"{name} takes {len(func_info.inputs)} arguments, got {len(args)}")
+    self.env_manager = self._new_environment()
+    caller = self.env_manager.environment[-1][0]
+    actual_parameters = {}
+    for i, ((formal_name, formal_value), arg) in enumerate(zip(func_info.inputs, args)):
+      value_to_pass = self._to_value(arg.value if isinstance(arg, Ref) else arg)
+      if not self._ref_type_checker(value_to_pass, formal_value):
+        super().error(ErrorType.TYPE_ERROR,f"Mismatching types {value_to_pass.type()} and {formal_value.type()}")
+      if formal_value.type() in [Type.REFINT, Type.REFBOOL, Type.REFSTRING]:
+        caller[f"argument {i}"] = value_to_pass   # a name no Brewin variable can have
+        actual_parameters[formal_name] = self._new_value(formal_value.type(), value_to_pass.value(), (f"argument {i}", value_to_pass))
+      else:
+        actual_parameters[formal_name] = value_to_pass
+    self.env_manager.new_func_scope(actual_parameters, func_info.return_var)
+    self.entry = name
+    self.ip = self._find_first_instruction(name)
+    self.return_stack = [self.CALL_RETURN]  # returning here ends the call, and runs update_references
+    self.terminate = False
+    self._execute()
+
+    for i, arg in enumerate(args):
+      if isinstance(arg, Ref) and f"argument {i}" in caller:
+        arg.value = self._from_value(caller[f"argument {i}"])
+    if func_info.return_var == InterpreterBase.VOID_DEF:
+      return None
+    result = caller.get(self._get_result_type(func_info.return_var.type()))
+    if result is None:
+      return None
+    if any(result is info.return_var for info in self.func_manager.func_cache.values()):
+      result = self._get_value(str(result.value()))   # a bare return's default, which is spelled as in the source
+    return self._from_value(result)
+
+  def _to_value(self, arg):
+    if isinstance(arg, bool):
+      return self._new_value(Type.BOOL, arg)
+    if isinstance(arg, int):
+      return self._new_value(Type.INT, arg)
+    if isinstance(arg, str):
+      return self._new_value(Type.STRING, arg)
+    super().error(ErrorType.TYPE_ERROR,f"Cannot pass {type(arg).__name__} to a Brewin function")
+
+  def _from_value(self, value_type):
+    if value_type.type() in [Type.STRING, Type.REFSTRING]:
+      return str(value_type.value())   # flattens ropes
+    return value_type.value()
+
+  # run step (one statement) in batches, checking the resource limits between batches
+  def _run_governed(self, step):
+    limits = self.limits
+    limits.start()
+    while not self.terminate:
+      ran = 0
+      for ran in range(1, limits.batch() + 1):
+        step()
+        if self.terminate:
+          break
+      limits.check(self, ran)
+
+  # same as the main run loop, but reports every line, call, return and block scope change to the hooks.
+  # Calls, returns and scope changes are read off the return stack and environment after each line, so
+  # the plain loop and the statement handlers carry no instrumentation at all.
+  def _run_hooked(self):
+    self._start_hooks()
+    try:
+      if self.limits:
+        self._run_governed(self._hooked_line)
+      else:
+        while not self.terminate:
+          self._hooked_line()
+    except Exception as exception:
+      self._error_hooks(exception)
+      raise
+    finally:
+      self._finish_hooks()
+
+  def _start_hooks(self):
+    self.on_line = handlers(self.hooks, 'on_line')
+    self.on_call = handlers(self.hooks, 'on_call')
+    self.on_return = handlers(self.hooks, 'on_return')
+    self.on_push = handlers(self.hooks, 'on_scope_push')
+    self.on_pop = handlers(self.hooks, 'on_scope_pop')
+    self.error_type = self.error_line = None
+    for hook in handlers(self.hooks, 'on_start'):
+      hook(self)
+
+  def _error_hooks(self, exception):
+    for hook in handlers(self.hooks, 'on_error'):
+      hook(self.error_type, self.error_line, exception)
+
+  def _finish_hooks(self):
+    for hook in handlers(self.hooks, 'on_finish'):
+      hook()
+
+  def _hooked_line(self):
+    ip = self.ip
+    depth = len(self.return_stack)
+    on_scope = self.on_push or self.on_pop
+    scopes = len(self.env_manager.environment[-1]) if on_scope else 0
+    for hook in self.on_line:
+      hook(ip)
+    self._process_line()
+    if len(self.return_stack) > depth:
+      for hook in self.on_call:
+        hook(self.tokenized_program[ip][1], ip, self.ip)
+    elif len(self.return_stack) < depth and self.ip != self.CALL_RETURN:  # leaving call()'s function is its end, like main's
+      for hook in self.on_return:
+        hook(ip, self.ip)
+    elif on_scope and not self.terminate:
+      change = len(self.env_manager.environment[-1]) - scopes
+      if change:
+        for hook in self.on_push if change > 0 else self.on_pop:
+          hook(ip, scopes + change)
+
   def _process_line(self):
-    if self.trace_output:
-      print(f"{self.ip:04}: {self.program[self.ip].rstrip()}")
     tokens = self.tokenized_program[self.ip]
     if not tokens:
       self._blank_line()
@@ -41,21 +509,21 @@ class Interpreter(InterpreterBase):
       case InterpreterBase.VAR_DEF:
         self._declare(args)
       case InterpreterBase.ASSIGN_DEF:
-        self._assign(args)
+        self._assign(args, self.proven[self.ip])
       case InterpreterBase.FUNCCALL_DEF:
-        self._funccall(args)
+        self._funccall(args, self.proven[self.ip])
       case InterpreterBase.ENDFUNC_DEF:
         self._endfunc()
       case InterpreterBase.IF_DEF:
-        self._if(args)
+        self._if(args, self.proven[self.ip])
       case InterpreterBase.ELSE_DEF:
         self._else()
       case InterpreterBase.ENDIF_DEF:
         self._endif()
       case InterpreterBase.RETURN_DEF:
-        self._return(args)
+        self._return(args, self.proven[self.ip])
       case InterpreterBase.WHILE_DEF:
-        self._while(args)
+        self._while(args, self.proven[self.ip])
       case InterpreterBase.ENDWHILE_DEF:
         self._endwhile(args)
       case default:
@@ -75,19 +543,19 @@ class Interpreter(InterpreterBase):
         self.env_manager.set(var, value, only_curr_scope=True)
     self._advance_to_next_statement()
 
-  def _assign(self, args): # needs to assign to the one it finds 
+  def _assign(self, args, proven=False): # needs to assign to the one it finds 
     if len(args) < 2:
         super().error(ErrorType.SYNTAX_ERROR,"Invalid assignment statement") #no
     vname = args[0]
     current_val = self._get_value(vname)
-    value_type = self._eval_expression(args[1:])
-    if self._ref_type_checker(current_val, value_type):
-        self._set_value(vname, Value(current_val.type(), value_type.value(), current_val.ref()))
+    value_type = self._eval_expression(args[1:], proven)
+    if proven or self._ref_type_checker(current_val, value_type):
+        self._set_value(vname, self._new_value(current_val.type(), value_type.value(), current_val.ref()))
         self._advance_to_next_statement()
     else:
         super().error(ErrorType.TYPE_ERROR,"Variable type and expression type do not match ", self.ip) #!
 
-  def _funccall(self, args):
+  def _funccall(self, args, proven=False):
     if not args:
       super().error(ErrorType.SYNTAX_ERROR,"Missing function name to call", self.ip) #!
     if args[0] == InterpreterBase.PRINT_DEF:
@@ -101,26 +569,102 @@ class Interpreter(InterpreterBase):
       self._advance_to_next_statement()
     else:
       funcname = args[0]
+      if not self.hooks and not self.limits:
+        plan = self._inline_plan(funcname)
+        if plan and self._inline_call(plan, args[1:], proven):
+          return
       self.return_stack.append(self.ip+1)
       # set up new scope w/ passed values
       formal_parameters = self._get_function_parameters(funcname)
       actual_parameters = {}
       for i, para in enumerate(args[1:]):
         value_to_pass = self._get_value(para)
-        if not self._ref_type_checker(value_to_pass, formal_parameters[i][1]):  # check if formal parameter and actual parameter types match
+        if not proven and not self._ref_type_checker(value_to_pass, formal_parameters[i][1]):  # check if formal parameter and actual parameter types match
           super().error(ErrorType.TYPE_ERROR,f"Mismatching types {value_to_pass.type()} and {formal_parameters[i][1].type()}", self.ip) #!
         if formal_parameters[i][1].type() in [Type.REFINT, Type.REFBOOL, Type.REFSTRING]:
-            actual_parameters[formal_parameters[i][0]] = Value(formal_parameters[i][1].type(), value_to_pass.value(), (para, value_to_pass))
+            actual_parameters[formal_parameters[i][0]] = self._new_value(formal_parameters[i][1].type(), value_to_pass.value(), (para, value_to_pass))
         else:
             actual_parameters[formal_parameters[i][0]] = value_to_pass
 
-      # set result to default at function level
+      # the function's default result goes in the new scope's return register
       return_var = self._get_function_return_var(funcname)
-      actual_parameters["this_is_the_reserved_result_variable"] = return_var # this is hacky but will do for now
-      self.env_manager.new_func_scope(actual_parameters) # pass parameters by value
+      self.env_manager.new_func_scope(actual_parameters, return_var) # pass parameters by value
     #   print(self.env_manager)
       self.ip = self._find_first_instruction(funcname)
 
+  # A function that takes only by-value parameters and starts with a return of an expression the checker
+  # proved can't fail can be run right at the call site: the arguments are looked up and checked just
+  # as below, the expression is evaluated on them and the result goes to the caller's resulti, resultb
+  # or results, with no frame, return address or reference copy-back. The plan is the formals and the
+  # expression in evaluation order, with each parameter replaced by its argument's position. Hooks and
+  # limits see every statement and call, so runs with either always make the real call.
+  def _inline_plan(self, funcname):
+    if funcname not in self.inline_plans:
+      self.inline_plans[funcname] = self._make_inline_plan(funcname)
+    return self.inline_plans[funcname]
+
+  def _make_inline_plan(self, funcname):
+    func_info = self.func_manager.get_function_info(funcname)
+    if func_info is None or func_info.return_var == InterpreterBase.VOID_DEF:
+      return None
+    if any(formal.type() not in (Type.INT, Type.BOOL, Type.STRING) for _, formal in func_info.inputs):
+      return None
+    ip = self._find_first_instruction(funcname)
+    while ip < len(self.tokenized_program) and not self.tokenized_program[ip]:
+      ip += 1   # blank lines only move ip along
+    if ip == len(self.tokenized_program) or not self.proven[ip]:
+      return None
+    tokens = self.tokenized_program[ip]
+    if tokens[0] != InterpreterBase.RETURN_DEF or len(tokens) < 2:
+      return None
+    if self.short_circuit and ('&' in tokens or '|' in tokens):
+      return None
+    positions = dict((name, i) for i, (name, _) in enumerate(func_info.inputs))   # a repeated name means the last one
+    steps = []
+    for token in reversed(tokens[1:]):
+      if token in self.binary_op_list:
+        steps.append(('op', token))
+      elif token == '!':
+        steps.append(('not', None))
+      elif token[0] == '"' or token.isdigit() or token[0] == '-' or token in (InterpreterBase.TRUE_DEF, InterpreterBase.FALSE_DEF):
+        steps.append(('literal', token))
+      elif token in positions:
+        steps.append(('argument', positions[token]))
+      else:
+        return None
+    return [formal for _, formal in func_info.inputs], steps
+
+  # run a call through its plan; False leaves the call to the usual path, which for arguments that are
+  # ref parameters themselves still has to copy them back, and raises any error in the same place
+  def _inline_call(self, plan, args, proven):
+    formals, steps = plan
+    if len(args) != len(formals):
+      return False
+    values = []
+    for para, formal in zip(args, formals):
+      value_to_pass = self._get_value(para)
+      if value_to_pass.r is not None or (not proven and not self._ref_type_checker(value_to_pass, formal)):
+        return False
+      values.append(value_to_pass)
+    ops = self.binary_ops
+    stack = []
+    for kind, operand in steps:
+      if kind == 'argument':
+        stack.append(values[operand])
+      elif kind == 'op':
+        v1 = stack.pop()
+        v2 = stack.pop()
+        stack.append(ops[v1.type()][operand](v1,v2))
+      elif kind == 'not':
+        v1 = stack.pop()
+        stack.append(self._new_value(v1.type(), not v1.value()))
+      else:
+        stack.append(self._get_value(operand))
+    value_type = stack[0]
+    self.env_manager.set_result(self._get_result_type(value_type.t), value_type)
+    self._advance_to_next_statement()
+    return True
+
   def _endfunc(self):
     if not self.return_stack:  # done with main!
       self.terminate = True
@@ -129,13 +673,15 @@ class Interpreter(InterpreterBase):
       self.env_manager.update_references()
       self.ip = self.return_stack.pop()
       self.env_manager.pop_env()
+      if self.ip == self.CALL_RETURN:  # the function call() entered is done
+        self.terminate = True
 
-  def _if(self, args):
+  def _if(self, args, proven=False):
     if not args:
       super().error(ErrorType.SYNTAX_ERROR,"Invalid if syntax", self.ip) #no
-    value_type = self._eval_expression(args)
+    value_type = self._eval_expression(args, proven)
     self.env_manager.nest_new_scope() 
-    if value_type.type() != Type.BOOL and value_type.type() != Type.REFBOOL:
+    if not proven and value_type.type() != Type.BOOL and value_type.type() != Type.REFBOOL:
       super().error(ErrorType.TYPE_ERROR,"Non-boolean if expression", self.ip) #!
     if value_type.value(): # if condition true
     #   self.env_manager.nest_new_scope() 
@@ -168,8 +714,10 @@ class Interpreter(InterpreterBase):
           return
     super().error(ErrorType.SYNTAX_ERROR,"Missing endif", self.ip) #no
 
-  def _return(self,args):
-    result_var = self._get_value("this_is_the_reserved_result_variable")
+  def _return(self, args, proven=False):
+    result_var = self.env_manager.return_vars[-1]
+    if result_var is None:  # return in main, which reports what looking up the old reserved variable did
+      super().error(ErrorType.NAME_ERROR,f"Unknown variable {RESERVED_RESULT}", self.ip) #!
     if result_var == 'void':
         if args:
             super().error(ErrorType.TYPE_ERROR,"Return type incompatible with function declaration", self.ip) #!
@@ -177,13 +725,13 @@ class Interpreter(InterpreterBase):
             self._endfunc()
             return
     if args:
-        value_type = self._eval_expression(args)
+        value_type = self._eval_expression(args, proven)
     else:
         value_type = result_var
-    if not self._ref_type_checker(value_type, result_var):
+    if not proven and not self._ref_type_checker(value_type, result_var):
         super().error(ErrorType.TYPE_ERROR,"Return type incompatible with function declaration", self.ip) #!
     result_type = self._get_result_type(value_type.t)
-    self._set_value(result_type, value_type, -2)  # return passed back in resulti, resultb, results to scope above based on expression value
+    self.env_manager.set_result(result_type, value_type, -2)  # return passed back in resulti, resultb, results to scope above based on expression value
     self._endfunc()
 
   def _get_result_type(self, t):
@@ -194,11 +742,11 @@ class Interpreter(InterpreterBase):
     elif t == Type.STRING or t == Type.REFSTRING:
       return 'results'
 
-  def _while(self, args):
+  def _while(self, args, proven=False):
     if not args:
       super().error(ErrorType.SYNTAX_ERROR,"Missing while expression", self.ip) #no
-    value_type = self._eval_expression(args)
-    if value_type.type() != Type.BOOL and value_type.type() != Type.REFBOOL:
+    value_type = self._eval_expression(args, proven)
+    if not proven and value_type.type() != Type.BOOL and value_type.type() != Type.REFBOOL:
       super().error(ErrorType.TYPE_ERROR,"Non-boolean while expression", self.ip) #!
     if value_type.value() == False:
       self._exit_while()
@@ -222,6 +770,8 @@ class Interpreter(InterpreterBase):
     super().error(ErrorType.SYNTAX_ERROR,"Missing endwhile", self.ip) #no
 
   def _endwhile(self, args):
+    if self.unchecked:
+      self._warm(self.ip)
     self.env_manager.remove_innermost_scope() # is this how we want while to scope- resets every loop?
     while_indent = self.indents[self.ip]
     cur_line = self.ip - 1
@@ -247,8 +797,10 @@ class Interpreter(InterpreterBase):
   def _input(self, args):
     if args:
       self._print(args)
-    result = super().get_input()
-    self.env_manager.set('results', Value(Type.STRING, result), res=True)
+    self._set_input_result(super().get_input())
+
+  def _set_input_result(self, result):
+    self.env_manager.set_result('results', self._new_value(Type.STRING, result))
     # self._set_value('results', Value(Type.STRING, result))   # return always passed back in results
 
   def _strtoint(self, args):
@@ -257,7 +809,7 @@ class Interpreter(InterpreterBase):
     value_type = self._get_value(args[0])
     if value_type.type() != Type.STRING and value_type.type() != Type.REFSTRING:
       super().error(ErrorType.TYPE_ERROR,"Non-string passed to strtoint", self.ip) #!
-    self.env_manager.set('resulti', Value(Type.INT, int(value_type.value())), res=True) 
+    self.env_manager.set_result('resulti', self._new_value(Type.INT, int(str(value_type.value()))))
     # self._set_value('resulti', Value(Type.INT, int(value_type.value())))   # return always passed back in resulti
 
   def _advance_to_next_statement(self):
@@ -266,67 +818,71 @@ class Interpreter(InterpreterBase):
 
   # create a lookup table of code to run for different operators on different types
   def _setup_operations(self):
+    new_value = self._new_value
     self.binary_op_list = ['+','-','*','/','%','==','!=', '<', '<=', '>', '>=', '&', '|']
     self.binary_ops = {}
     self.binary_ops[Type.INT] = {
-     '+': lambda a,b: Value(Type.INT, a.value()+b.value()),
-     '-': lambda a,b: Value(Type.INT, a.value()-b.value()),
-     '*': lambda a,b: Value(Type.INT, a.value()*b.value()),
-     '/': lambda a,b: Value(Type.INT, a.value()//b.value()),  # // for integer ops
-     '%': lambda a,b: Value(Type.INT, a.value()%b.value()),
-     '==': lambda a,b: Value(Type.BOOL, a.value()==b.value()),
-     '!=': lambda a,b: Value(Type.BOOL, a.value()!=b.value()),
-     '>': lambda a,b: Value(Type.BOOL, a.value()>b.value()),
-     '<': lambda a,b: Value(Type.BOOL, a.value()<b.value()),
-     '>=': lambda a,b: Value(Type.BOOL, a.value()>=b.value()),
-     '<=': lambda a,b: Value(Type.BOOL, a.value()<=b.value()),
+     '+': lambda a,b: new_value(Type.INT, a.value()+b.value()),
+     '-': lambda a,b: new_value(Type.INT, a.value()-b.value()),
+     '*': lambda a,b: new_value(Type.INT, a.value()*b.value()),
+     '/': lambda a,b: new_value(Type.INT, a.value()//b.value()),  # // for integer ops
+     '%': lambda a,b: new_value(Type.INT, a.value()%b.value()),
+     '==': lambda a,b: new_value(Type.BOOL, a.value()==b.value()),
+     '!=': lambda a,b: new_value(Type.BOOL, a.value()!=b.value()),
+     '>': lambda a,b: new_value(Type.BOOL, a.value()>b.value()),
+     '<': lambda a,b: new_value(Type.BOOL, a.value()<b.value()),
+     '>=': lambda a,b: new_value(Type.BOOL, a.value()>=b.value()),
+     '<=': lambda a,b: new_value(Type.BOOL, a.value()<=b.value()),
     }
     self.binary_ops[Type.STRING] = {
-     '+': lambda a,b: Value(Type.STRING, a.value()+b.value()),
-     '==': lambda a,b: Value(Type.BOOL, a.value()==b.value()),
-     '!=': lambda a,b: Value(Type.BOOL, a.value()!=b.value()),
-     '>': lambda a,b: Value(Type.BOOL, a.value()>b.value()),
-     '<': lambda a,b: Value(Type.BOOL, a.value()<b.value()),
-     '>=': lambda a,b: Value(Type.BOOL, a.value()>=b.value()),
-     '<=': lambda a,b: Value(Type.BOOL, a.value()<=b.value()),
+     '+': lambda a,b: new_value(Type.STRING, concat(a.value(), b.value())),  # see rope_v2
+     '==': lambda a,b: new_value(Type.BOOL, a.value()==b.value()),
+     '!=': lambda a,b: new_value(Type.BOOL, a.value()!=b.value()),
+     '>': lambda a,b: new_value(Type.BOOL, a.value()>b.value()),
+     '<': lambda a,b: new_value(Type.BOOL, a.value()<b.value()),
+     '>=': lambda a,b: new_value(Type.BOOL, a.value()>=b.value()),
+     '<=': lambda a,b: new_value(Type.BOOL, a.value()<=b.value()),
     }
     self.binary_ops[Type.BOOL] = {
-     '&': lambda a,b: Value(Type.BOOL, a.value() and b.value()),
-     '==': lambda a,b: Value(Type.BOOL, a.value()==b.value()),
-     '!=': lambda a,b: Value(Type.BOOL, a.value()!=b.value()),
-     '|': lambda a,b: Value(Type.BOOL, a.value() or b.value())
+     '&': lambda a,b: new_value(Type.BOOL, a.value() and b.value()),
+     '==': lambda a,b: new_value(Type.BOOL, a.value()==b.value()),
+     '!=': lambda a,b: new_value(Type.BOOL, a.value()!=b.value()),
+     '|': lambda a,b: new_value(Type.BOOL, a.value() or b.value())
     }
     self.binary_ops[Type.REFINT] = {
-     '+': lambda a,b: Value(Type.INT, a.value()+b.value()),
-     '-': lambda a,b: Value(Type.INT, a.value()-b.value()),
-     '*': lambda a,b: Value(Type.INT, a.value()*b.value()),
-     '/': lambda a,b: Value(Type.INT, a.value()//b.value()),  # // for integer ops
-     '%': lambda a,b: Value(Type.INT, a.value()%b.value()),
-     '==': lambda a,b: Value(Type.BOOL, a.value()==b.value()),
-     '!=': lambda a,b: Value(Type.BOOL, a.value()!=b.value()),
-     '>': lambda a,b: Value(Type.BOOL, a.value()>b.value()),
-     '<': lambda a,b: Value(Type.BOOL, a.value()<b.value()),
-     '>=': lambda a,b: Value(Type.BOOL, a.value()>=b.value()),
-     '<=': lambda a,b: Value(Type.BOOL, a.value()<=b.value()),
+     '+': lambda a,b: new_value(Type.INT, a.value()+b.value()),
+     '-': lambda a,b: new_value(Type.INT, a.value()-b.value()),
+     '*': lambda a,b: new_value(Type.INT, a.value()*b.value()),
+     '/': lambda a,b: new_value(Type.INT, a.value()//b.value()),  # // for integer ops
+     '%': lambda a,b: new_value(Type.INT, a.value()%b.value()),
+     '==': lambda a,b: new_value(Type.BOOL, a.value()==b.value()),
+     '!=': lambda a,b: new_value(Type.BOOL, a.value()!=b.value()),
+     '>': lambda a,b: new_value(Type.BOOL, a.value()>b.value()),
+     '<': lambda a,b: new_value(Type.BOOL, a.value()<b.value()),
+     '>=': lambda a,b: new_value(Type.BOOL, a.value()>=b.value()),
+     '<=': lambda a,b: new_value(Type.BOOL, a.value()<=b.value()),
     }
     self.binary_ops[Type.REFSTRING] = {
-     '+': lambda a,b: Value(Type.STRING, a.value()+b.value()),
-     '==': lambda a,b: Value(Type.BOOL, a.value()==b.value()),
-     '!=': lambda a,b: Value(Type.BOOL, a.value()!=b.value()),
-     '>': lambda a,b: Value(Type.BOOL, a.value()>b.value()),
-     '<': lambda a,b: Value(Type.BOOL, a.value()<b.value()),
-     '>=': lambda a,b: Value(Type.BOOL, a.value()>=b.value()),
-     '<=': lambda a,b: Value(Type.BOOL, a.value()<=b.value()),
+     '+': lambda a,b: new_value(Type.STRING, concat(a.value(), b.value())),  # see rope_v2
+     '==': lambda a,b: new_value(Type.BOOL, a.value()==b.value()),
+     '!=': lambda a,b: new_value(Type.BOOL, a.value()!=b.value()),
+     '>': lambda a,b: new_value(Type.BOOL, a.value()>b.value()),
+     '<': lambda a,b: new_value(Type.BOOL, a.value()<b.value()),
+     '>=': lambda a,b: new_value(Type.BOOL, a.value()>=b.value()),
+     '<=': lambda a,b: new_value(Type.BOOL, a.value()<=b.value()),
     }
     self.binary_ops[Type.REFBOOL] = {
-     '&': lambda a,b: Value(Type.BOOL, a.value() and b.value()),
-     '==': lambda a,b: Value(Type.BOOL, a.value()==b.value()),
-     '!=': lambda a,b: Value(Type.BOOL, a.value()!=b.value()),
-     '|': lambda a,b: Value(Type.BOOL, a.value() or b.value())
+     '&': lambda a,b: new_value(Type.BOOL, a.value() and b.value()),
+     '==': lambda a,b: new_value(Type.BOOL, a.value()==b.value()),
+     '!=': lambda a,b: new_value(Type.BOOL, a.value()!=b.value()),
+     '|': lambda a,b: new_value(Type.BOOL, a.value() or b.value())
     }
 
   def _compute_indentation(self, program):
-    self.indents = [len(line) - len(line.lstrip(' ')) for line in program]
+    self.indents = [self._indentation(line) for line in program]
+
+  def _indentation(self, line):
+    return len(line) - len(line.lstrip(' '))
 
   def _get_function_parameters(self, funcname):
     func_info = self.func_manager.get_function_info(funcname)
@@ -338,8 +894,22 @@ class Interpreter(InterpreterBase):
     func_info = self.func_manager.get_function_info(funcname)
     if func_info == None:
       super().error(ErrorType.NAME_ERROR,f"Unable to locate {funcname} function", self.ip) #!
+    if funcname in self.unchecked:
+      self._warm(funcname)
     return func_info.start_ip
 
+  # count a call to a function (by name) or a trip round a loop (by its endwhile line), and have the
+  # function checked the time it gets hot; a plan made for it while it was unchecked is made again
+  def _warm(self, key):
+    heat = self.heat.get(key, 0) + 1
+    self.heat[key] = heat
+    if heat == self.hot:
+      funcname = self.checker.function_at(key) if type(key) is int else key
+      if funcname in self.unchecked:
+        self.unchecked.remove(funcname)
+        self.checker.check_function(funcname)
+        self.inline_plans.pop(funcname, None)
+
   def _get_function_return_var(self, funcname):
     func_info = self.func_manager.get_function_info(funcname)
     if func_info == None:
@@ -351,12 +921,15 @@ class Interpreter(InterpreterBase):
     if not token:
       super().error(ErrorType.NAME_ERROR,f"Empty token", self.ip) #no
     if token[0] == '"':
-      return Value(Type.STRING, token.strip('"'))
+      return self._new_value(Type.STRING, token.strip('"'))
     if token.isdigit() or token[0] == '-':
-      return Value(Type.INT, int(token))
+      return self._new_value(Type.INT, int(token))
     if token == InterpreterBase.TRUE_DEF or token == InterpreterBase.FALSE_DEF:
-      return Value(Type.BOOL, token == InterpreterBase.TRUE_DEF)
-    value = self.env_manager.get(token)
+      return self._new_value(Type.BOOL, token == InterpreterBase.TRUE_DEF)
+    if self.result_registers and token in self.RESULT_NAMES:
+      value = self.env_manager.get_result(token)
+    else:
+      value = self.env_manager.get(token)
     if value  == None:
       super().error(ErrorType.NAME_ERROR,f"Unknown variable {token}", self.ip) #!
     return value
@@ -369,7 +942,13 @@ class Interpreter(InterpreterBase):
         self.env_manager.set(varname, value, scope)
 
   # evaluate expressions in prefix notation: + 5 * 6 x
-  def _eval_expression(self, tokens):
+  def _eval_expression(self, tokens, proven=False):
+    if self.short_circuit:
+      tree = self._get_expression_tree(tokens)
+      if tree is not None:
+        return self._eval_tree(tree, proven)
+    if proven:
+      return self._eval_proven_expression(tokens)
     stack = []
 
     for token in reversed(tokens):
@@ -386,7 +965,7 @@ class Interpreter(InterpreterBase):
         v1 = stack.pop()
         if v1.type() != Type.BOOL and v1.type() != Type.REFBOOL:
           super().error(ErrorType.TYPE_ERROR,f"Expecting boolean for ! {v1.type()}", self.ip) #!
-        stack.append(Value(v1.type(), not v1.value()))
+        stack.append(self._new_value(v1.type(), not v1.value()))
       else:
         value_type = self._get_value(token)
         stack.append(value_type)
@@ -396,6 +975,72 @@ class Interpreter(InterpreterBase):
 
     return stack[0]
 
+  # same as _eval_expression, minus the checks the static checker already proved will pass
+  def _eval_proven_expression(self, tokens):
+    stack = []
+    for token in reversed(tokens):
+      if token in self.binary_op_list:
+        v1 = stack.pop()
+        v2 = stack.pop()
+        stack.append(self.binary_ops[v1.type()][token](v1,v2))
+      elif token == '!':
+        v1 = stack.pop()
+        stack.append(self._new_value(v1.type(), not v1.value()))
+      else:
+        stack.append(self._get_value(token))
+    return stack[0]
+
+  # parse a prefix expression into nested (op, left, right) and ('!', operand) tuples once per line;
+  # malformed expressions give None and are left to _eval_expression to report
+  def _get_expression_tree(self, tokens):
+    if self.ip in self.expression_trees:
+      return self.expression_trees[self.ip]
+    stack = []
+    for token in reversed(tokens):
+      if token in self.binary_op_list:
+        if len(stack) < 2:
+          stack = None
+          break
+        left = stack.pop()
+        right = stack.pop()
+        stack.append((token, left, right))
+      elif token == '!':
+        if not stack:
+          stack = None
+          break
+        stack.append(('!', stack.pop()))
+      else:
+        stack.append(token)
+    tree = stack[0] if stack and len(stack) == 1 else None
+    self.expression_trees[self.ip] = tree
+    return tree
+
+  # evaluate a parsed expression; & and | look at their left operand first and only evaluate the
+  # right one if it's still needed, every other operator evaluates right to left like _eval_expression
+  def _eval_tree(self, node, proven):
+    if type(node) is str:
+      return self._get_value(node)
+    if node[0] == '!':
+      v1 = self._eval_tree(node[1], proven)
+      if not proven and v1.type() != Type.BOOL and v1.type() != Type.REFBOOL:
+        super().error(ErrorType.TYPE_ERROR,f"Expecting boolean for ! {v1.type()}", self.ip) #!
+      return self._new_value(v1.type(), not v1.value())
+    token, left, right = node
+    if token == '&' or token == '|':
+      v1 = self._eval_tree(left, proven)
+      if (v1.type() == Type.BOOL or v1.type() == Type.REFBOOL) and bool(v1.value()) == (token == '|'):
+        return self._new_value(Type.BOOL, v1.value())
+      v2 = self._eval_tree(right, proven)
+    else:
+      v2 = self._eval_tree(right, proven)
+      v1 = self._eval_tree(left, proven)
+    if not proven:
+      if not self._ref_type_checker(v1, v2):
+        super().error(ErrorType.TYPE_ERROR,f"Mismatching types {v1.type()} and {v2.type()}", self.ip) #!
+      if token not in self.binary_ops[v1.type()]:
+        super().error(ErrorType.TYPE_ERROR,f"Operator {token} is not compatible with {v1.type()}", self.ip) #!
+    return self.binary_ops[v1.type()][token](v1,v2)
+
   def _ref_type_checker(self, v1, v2):
     if v1.type() != v2.type():
         if v1.type() in [Type.INT, Type.REFINT] and v2.type() in [Type.INT, Type.REFINT]:
@@ -492,7 +1137,8 @@ def main():
     i = Interpreter(trace_output=True)
     i.run(input)
 
-main()
+if __name__ == "__main__":
+  main()
 
 'func main void',
 ' var int a',
@@ -0,0 +1,81 @@
+import bisect
+from intbase import InterpreterBase
+from tokenize import Tokenizer
+from source_v2 import MappedSource
+
+# cheap test on the raw text of a line for starting with the func keyword (and not, say, funccall); only
+# tokenizing the line can say for sure
+def may_be_header(line):
+  stripped = line.lstrip()
+  if not stripped.startswith(InterpreterBase.FUNC_DEF):
+    return False
+  after = stripped[len(InterpreterBase.FUNC_DEF):][:1]
+  return after.isspace() or after in ('', '"', InterpreterBase.COMMENT_DEF)
+
+# LazyLoader lets the interpreter start on a program after indexing only its func header lines. The lines
+# from one header up to the next are tokenized (and their indentation measured) the first time anything
+# looks at one of them, so the front end work done tracks the functions a run actually reaches rather
+# than the size of the source.
+class LazyLoader:
+  def __init__(self, program):
+    self.program = program
+    candidates = program.lines_with(InterpreterBase.FUNC_DEF) if type(program) is MappedSource else range(len(program))
+    self.headers = [line_num for line_num in candidates if may_be_header(program[line_num])]
+    self.tokenized_program = [Unloaded(self, line_num) for line_num in range(len(program))]
+    self.indents = [None] * len(program)   # filled in together with the tokens
+    for line_num in self.headers:
+      self.tokenized_program[line_num] = Tokenizer._tokenize(line_num, program[line_num].rstrip())
+      self.indents[line_num] = self._indentation(program[line_num])
+    # the tokenizer has the last word on whether a line starts with the func keyword
+    self.headers = [line_num for line_num in self.headers
+                    if self.tokenized_program[line_num] and self.tokenized_program[line_num][0] == InterpreterBase.FUNC_DEF]
+    self.loaded = set()   # indexes into headers (-1 for the lines before the first one) of the loaded ranges
+
+  def _indentation(self, line):
+    return len(line) - len(line.lstrip(' '))
+
+  # tokenize the range of lines holding line_num if that hasn't happened yet; returns line_num's tokens
+  def load(self, line_num):
+    i = bisect.bisect_right(self.headers, line_num) - 1
+    if i not in self.loaded:
+      self.loaded.add(i)
+      start = self.headers[i] if i >= 0 else 0
+      end = self.headers[i + 1] if i + 1 < len(self.headers) else len(self.program)
+      self.tokenized_program[start:end] = Tokenizer.tokenize_lines(self.program, start, end)
+      self.indents[start:end] = [self._indentation(line) for line in self.program[start:end]]
+    return self.tokenized_program[line_num]
+
+# Unloaded stands in for the tokens of a line that hasn't been loaded. Using it in any way loads the
+# line's range and then acts on the real tokens, so code that scans from a loaded function into one that
+# isn't (only malformed programs do) sees exactly what it would have seen after an eager tokenize.
+class Unloaded:
+  __slots__ = ('loader', 'line_num')
+  __hash__ = None
+
+  def __init__(self, loader, line_num):
+    self.loader = loader
+    self.line_num = line_num
+
+  def _tokens(self):
+    return self.loader.load(self.line_num)
+
+  def __bool__(self):
+    return bool(self._tokens())
+
+  def __len__(self):
+    return len(self._tokens())
+
+  def __getitem__(self, index):
+    return self._tokens()[index]
+
+  def __iter__(self):
+    return iter(self._tokens())
+
+  def __contains__(self, token):
+    return token in self._tokens()
+
+  def __eq__(self, other):
+    return self._tokens() == other
+
+  def __repr__(self):
+    return repr(self._tokens())
@@ -0,0 +1,135 @@
+import os
+import hashlib
+import re
+from intbase import InterpreterBase
+from tokenize import Tokenizer
+import compact_v2
+from cache_v2 import interpreter_version
+from lazy_v2 import may_be_header
+
+HEADER = re.compile(r'^[^\S\n]*func(?=[^\S\n]|["#]|$)', re.MULTILINE)   # may_be_header, on a line of a longer text
+
+# FunctionCache keeps the front end's work on each function so that programs sharing library code only
+# pay for the lines they don't share. A program is cut at its func lines into pieces (the lines before
+# the first function are one more), and each piece is looked up by a hash of its text and the
+# interpreter version. A piece is tokenized at most once per process, kept as the token lists,
+# indentation and header offsets the interpreter uses and as a compact_v2.CompactProgram; with a
+# directory, the CompactProgram's bytes are also kept on disk for other processes. Token lists are
+# shared between the programs and interpreters that use a piece, which is safe because nothing
+# changes them in place. A piece also keeps, in memory only, what the static checker found for its
+# function, keyed by everything else that finding depended on: the frames the function is entered
+# with, the signatures of the functions it calls and whether refs can escape (see
+# StaticChecker._reuse_key). At most max_pieces pieces are kept in memory, the least recently used
+# going first.
+class FunctionCache:
+  def __init__(self, directory=None, max_pieces=100000):
+    self.directory = directory
+    self.max_pieces = max_pieces
+    self.pieces = {}   # key -> [CompactProgram or None, (token lists, indents, header offsets) or None, check results]
+    self.hits = self.misses = self.disk_hits = 0
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+
+  # the tokenized program, the indentation of every line and the func header lines of program, as
+  # Tokenizer, _compute_indentation and FunctionManager would have found them. If checks is given, the
+  # check results kept with each piece go in it by the piece's first line, as (the line after the
+  # piece, its results), for StaticChecker to reuse and add to.
+  def front_end(self, program, checks=None):
+    tokenized_program, indents, headers = [], [], []
+    for start, end in _pieces(program):
+      tokens, piece_indents, piece_headers = self._decoded(program, start, end, checks)
+      tokenized_program += tokens
+      indents += piece_indents
+      headers += [start + offset for offset in piece_headers]
+    return tokenized_program, indents, headers
+
+  # the CompactProgram compact_v2.encode would have made of program; checks as for front_end
+  def encode(self, program, checks=None):
+    return compact_v2.join([self._compact(program, start, end, checks) for start, end in _pieces(program)])
+
+  def stats(self):
+    return {'hits': self.hits, 'misses': self.misses, 'disk_hits': self.disk_hits, 'pieces': len(self.pieces)}
+
+  def _decoded(self, program, start, end, checks):
+    entry = self._entry(program, start, end, checks)
+    if entry[1] is None:
+      if entry[0] is not None:
+        tokens = [entry[0].line(line_num) for line_num in range(len(entry[0]))]
+        indents = list(entry[0].indents)
+      else:
+        tokens = Tokenizer.tokenize_lines(program, start, end)
+        indents = [len(line) - len(line.lstrip(' ')) for line in program[start:end]]
+      headers = [offset for offset, line in enumerate(tokens) if line and line[0] == InterpreterBase.FUNC_DEF]
+      entry[1] = (tokens, indents, headers)
+    return entry[1]
+
+  def _compact(self, program, start, end, checks):
+    entry = self._entry(program, start, end, checks)
+    if entry[0] is None:
+      entry[0] = compact_v2.encode(program[start:end], start)
+    return entry[0]
+
+  # the cache entry for lines start to end of program, from memory or disk, or a new empty one that the
+  # caller fills in (encoded right away if there is a directory to write it to). Pieces are tokenized
+  # where they are in the program, so errors have the line numbers they always had, and a piece that
+  # fails to tokenize stays empty and fails again the next time.
+  def _entry(self, program, start, end, checks):
+    lines = program[start:end]
+    digest = hashlib.sha256(interpreter_version().encode())
+    digest.update('\n'.join(lines).encode())
+    key = digest.hexdigest()
+    entry = self.pieces.pop(key, None)
+    if entry is not None:
+      self.hits += 1
+    else:
+      compact = self._read(key)
+      if compact is not None:
+        self.disk_hits += 1
+      else:
+        self.misses += 1
+        if self.directory:
+          compact = compact_v2.encode(lines, start)
+          self._write(key, compact)
+      entry = [compact, None, {}]
+      if len(self.pieces) >= self.max_pieces:
+        del self.pieces[next(iter(self.pieces))]
+    self.pieces[key] = entry   # now the most recently used
+    if checks is not None:
+      checks[start] = (end, entry[2])
+    return entry
+
+  def _read(self, key):
+    if not self.directory:
+      return None
+    try:
+      with open(os.path.join(self.directory, key), 'rb') as f:
+        return compact_v2.from_bytes(f.read())
+    except (OSError, ValueError):
+      return None
+
+  def _write(self, key, compact):
+    if self.directory:
+      path = os.path.join(self.directory, key)
+      temp_path = f"{path}.{os.getpid()}.tmp"
+      with open(temp_path, 'wb') as f:
+        f.write(compact.to_bytes())
+      os.replace(temp_path, path)
+
+# (start, end) of each piece of program: the lines before the first func line, then each func line up
+# to the next. Func lines are found with one search of the whole text, unless a line has a newline in
+# it. A line that only looks like a func line (see may_be_header) splits a function in two, which
+# costs a piece.
+def _pieces(program):
+  text = '\n'.join(program)
+  if text.count('\n') == len(program) - 1:
+    bounds = [0]
+    line_num = position = 0
+    for match in HEADER.finditer(text):
+      line_num += text.count('\n', position, match.start())
+      position = match.start()
+      if line_num:
+        bounds.append(line_num)
+  else:
+    bounds = [0] + [line_num for line_num, line in enumerate(program) if line_num and may_be_header(line)]
+  bounds.append(len(program))
+  return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
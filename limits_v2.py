@@ -0,0 +1,79 @@
+import time
+from intbase import ErrorType
+from val_v2 import Type
+
+# Limits caps what a single run may use: statements executed, call depth, bytes held in string
+# variables, live variables and wall-clock time. The interpreter runs statements in batches of
+# check_every and only looks at the limits between batches, so a governed run costs one check per
+# batch rather than one per statement. Any limit left as None is not enforced.
+class Limits:
+  def __init__(self, max_statements=None, max_call_depth=None, max_string_bytes=None, max_live_variables=None,
+               deadline_seconds=None, check_every=1024):
+    self.max_statements = max_statements
+    self.max_call_depth = max_call_depth
+    self.max_string_bytes = max_string_bytes  # Brewin strings are ASCII, so one byte per character
+    self.max_live_variables = max_live_variables
+    self.deadline_seconds = deadline_seconds
+    self.check_every = check_every
+
+  # called when a governed run begins
+  def start(self):
+    self.executed = 0
+    self.deadline = time.monotonic() + self.deadline_seconds if self.deadline_seconds is not None else None
+
+  # how many statements may run before the next check; never more than the statement budget has left
+  def batch(self):
+    if self.max_statements is None:
+      return self.check_every
+    return max(0, min(self.check_every, self.max_statements - self.executed))
+
+  # account for ran statements and stop the run if any limit is exceeded
+  def check(self, interpreter, ran):
+    self.executed += ran
+    if interpreter.terminate:
+      return
+    if self.max_statements is not None and self.executed >= self.max_statements:
+      self._exceeded(interpreter, f"Executed {self.executed} statements, the limit is {self.max_statements}")
+    depth = len(interpreter.return_stack)
+    if self.max_call_depth is not None and depth > self.max_call_depth:
+      self._exceeded(interpreter, f"Call depth {depth} exceeds the limit of {self.max_call_depth}")
+    if self.deadline is not None and time.monotonic() > self.deadline:
+      self._exceeded(interpreter, f"Ran for more than {self.deadline_seconds} seconds")
+    if self.max_string_bytes is not None or self.max_live_variables is not None:
+      self._check_variables(interpreter)
+
+  # walk every scope of every frame; Values shared between names are only counted once
+  def _check_variables(self, interpreter):
+    names = 0
+    string_bytes = 0
+    seen = set()
+    for func_scope in interpreter.env_manager.environment:
+      for scope in func_scope:
+        names += len(scope)
+        for value in scope.values():
+          if value != 'void' and id(value) not in seen and value.type() in (Type.STRING, Type.REFSTRING):
+            seen.add(id(value))
+            string_bytes += len(value.value())
+    if self.max_live_variables is not None and names > self.max_live_variables:
+      self._exceeded(interpreter, f"{names} live variables exceed the limit of {self.max_live_variables}")
+    if self.max_string_bytes is not None and string_bytes > self.max_string_bytes:
+      self._exceeded(interpreter, f"Strings hold {string_bytes} bytes, the limit is {self.max_string_bytes}")
+
+  # String + can double a string every statement, far too fast for the checks between batches, so
+  # wrap the concatenations in ops (an interpreter's binary_ops) to refuse any single result over the limit
+  def guard_strings(self, interpreter, ops):
+    if self.max_string_bytes is None:
+      return
+    for value_type in (Type.STRING, Type.REFSTRING):
+      ops[value_type]['+'] = self._guarded_concat(interpreter, ops[value_type]['+'])
+
+  def _guarded_concat(self, interpreter, concat):
+    def guarded(a, b):
+      size = len(a.value()) + len(b.value())
+      if size > self.max_string_bytes:
+        self._exceeded(interpreter, f"String of {size} bytes exceeds the limit of {self.max_string_bytes}")
+      return concat(a, b)
+    return guarded
+
+  def _exceeded(self, interpreter, description):
+    interpreter.error(ErrorType.RESOURCE_ERROR, description, interpreter.ip)
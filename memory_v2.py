@@ -0,0 +1,145 @@
+import sys
+from rope_v2 import Rope
+from hooks_v2 import Hooks
+import tracemalloc
+
+# MemoryTracker charges what each statement grows tracemalloc's traced total by to its line and function,
+# and keeps each function's peak above its level on entry, callees included. Every sample_every statements
+# and on each new deepest call it also measures the environment, the return stack and the output log.
+class MemoryTracker(Hooks):
+  def __init__(self, sample_every=64):
+    self.sample_every = sample_every
+    self.reset()
+
+  def reset(self):
+    self.line_counts = {}                 # ip -> times executed
+    self.line_allocated = {}              # ip -> bytes the line grew the traced total by, over every run of it
+    self.func_allocated = {}              # function name -> bytes its own lines grew the traced total by
+    self.func_peak = {}                   # function name -> most bytes above its level on entry, in any one call
+    self.peak_traced = 0                  # most bytes above the traced total when main started
+    self.peak_environment_bytes = 0       # frames, scopes, Values and what they hold
+    self.peak_environment_variables = 0
+    self.peak_frames = 0
+    self.peak_return_stack_depth = 0
+    self.output_lines = 0
+    self.output_bytes = 0
+
+  def on_start(self, interpreter):
+    self.reset()
+    self.interpreter = interpreter
+    self.program = interpreter.program
+    self.started_tracing = not tracemalloc.is_tracing()
+    if self.started_tracing:
+      tracemalloc.start()
+    self.base = tracemalloc.get_traced_memory()[0]
+    self.overhead = 0   # what the tracker itself has allocated since, left out of every measurement
+    self.frames = [[interpreter.entry, self.base, 0]]  # [name, traced total on entry, peak above it]
+    self.pending_ip = None
+    self.pending_size = self.base
+    self.countdown = self.sample_every
+    self._sample()
+
+  def on_line(self, ip):
+    size = tracemalloc.get_traced_memory()[0]
+    self._settle(size)
+    self.line_counts[ip] = self.line_counts.get(ip, 0) + 1
+    self.pending_ip = ip
+    self.countdown -= 1
+    if not self.countdown:
+      self.countdown = self.sample_every
+      self._sample()
+    self._own(size)
+
+  def on_call(self, name, ip, callee_ip):
+    size = tracemalloc.get_traced_memory()[0]
+    self._settle(size)
+    self.frames.append([name, size - self.overhead, 0])
+    if len(self.interpreter.return_stack) > self.peak_return_stack_depth:   # the deepest the environment has been
+      self._sample()
+    self._own(size)
+
+  def on_return(self, ip, return_ip):
+    size = tracemalloc.get_traced_memory()[0]
+    self._settle(size)
+    self._exit()
+    self._own(size)
+
+  # close whatever frames are still open (just main, unless the program stopped on an error)
+  def on_finish(self):
+    self._settle(tracemalloc.get_traced_memory()[0])
+    while self.frames:
+      self._exit()
+    self._sample()
+    output = self.interpreter.output_log
+    self.output_lines = len(output)
+    self.output_bytes = sys.getsizeof(output) + sum(sys.getsizeof(line) for line in output)
+    if self.started_tracing:
+      tracemalloc.stop()
+
+  # charge the growth since the last statement started to that statement and its function
+  def _settle(self, size):
+    grown = size - self.pending_size
+    level = size - self.overhead
+    if level - self.base > self.peak_traced:
+      self.peak_traced = level - self.base
+    frame = self.frames[-1]
+    if level - frame[1] > frame[2]:
+      frame[2] = level - frame[1]
+    if self.pending_ip is not None and grown > 0:
+      self.line_allocated[self.pending_ip] = self.line_allocated.get(self.pending_ip, 0) + grown
+      self.func_allocated[frame[0]] = self.func_allocated.get(frame[0], 0) + grown
+    self.pending_ip = None
+
+  # the tracker's bookkeeping since the traced total was size isn't the program's
+  def _own(self, size):
+    self.pending_size = tracemalloc.get_traced_memory()[0]
+    self.overhead += self.pending_size - size
+
+  def _exit(self):
+    name, entered, peak = self.frames.pop()
+    self.func_peak[name] = max(self.func_peak.get(name, 0), peak)
+    if self.frames:
+      caller = self.frames[-1]
+      caller[2] = max(caller[2], entered + peak - caller[1])
+
+  # measure the environment (Values shared between names counted once) and the return stack
+  def _sample(self):
+    environment = self.interpreter.env_manager.environment
+    size = sys.getsizeof(environment)
+    variables = 0
+    seen = set()
+    for func_scope in environment:
+      size += sys.getsizeof(func_scope)
+      for scope in func_scope:
+        size += sys.getsizeof(scope)
+        variables += len(scope)
+        for value in scope.values():
+          if value != 'void' and id(value) not in seen:
+            seen.add(id(value))
+            size += sys.getsizeof(value) + _payload_size(value.value())
+    self.peak_environment_bytes = max(self.peak_environment_bytes, size)
+    self.peak_environment_variables = max(self.peak_environment_variables, variables)
+    self.peak_frames = max(self.peak_frames, len(environment))
+    self.peak_return_stack_depth = max(self.peak_return_stack_depth, len(self.interpreter.return_stack))
+
+  # the lines that allocated the most, functions by peak, and the sizes of the interpreter's structures
+  def report(self, limit=10):
+    out = [f"Peak above start: {self.peak_traced / 1024:.1f} KB", '', 'Top allocating lines:',
+           f"{'line':>6} {'count':>10} {'KB':>10} {'B/hit':>8}  source"]
+    for ip in sorted(self.line_allocated, key=self.line_allocated.get, reverse=True)[:limit]:
+      allocated, count = self.line_allocated[ip], self.line_counts[ip]
+      out.append(f"{ip:6} {count:10} {allocated / 1024:10.1f} {allocated / count:8.0f}  {self.program[ip].strip()}")
+    out += ['', 'Functions:', f"{'peak KB':>10} {'alloc KB':>10}  function"]
+    for name in sorted(self.func_peak, key=self.func_peak.get, reverse=True)[:limit]:
+      out.append(f"{self.func_peak[name] / 1024:10.1f} {self.func_allocated.get(name, 0) / 1024:10.1f}  {name}")
+    out += ['', 'Structures (peak):',
+            f"  environment   {self.peak_environment_bytes / 1024:.1f} KB, {self.peak_environment_variables} variables, {self.peak_frames} frames",
+            f"  return stack  {self.peak_return_stack_depth} deep",
+            f"  output log    {self.output_bytes / 1024:.1f} KB, {self.output_lines} lines"]
+    return '\n'.join(out)
+
+# bytes held by a Value's Python value; a rope is counted as the text it stands for
+def _payload_size(value):
+  if type(value) is Rope:
+    return sys.getsizeof('') + len(value)
+  return sys.getsizeof(value)
@@ -0,0 +1,82 @@
+from intbase import InterpreterBase
+from tokenize import Tokenizer
+import multiprocessing
+import os
+import compact_v2
+from lazy_v2 import may_be_header
+
+MIN_CHUNK_LINES = 20000   # smaller pieces aren't worth sending to another process
+CHUNKS_PER_PROCESS = 4    # a few pieces per process, so one slow piece doesn't hold up the rest
+
+# The front end (tokenizing, measuring indentation and finding function headers) only ever looks at one
+# line at a time, so a big program can be cut into pieces at func lines and each piece handled in a
+# separate process. The pieces come back in order and are stitched together with their line numbers
+# moved to where they are in the whole program. Programs too small to split are done right here.
+
+# the tokenized program, the indentation of every line and the func header lines of program
+def front_end(program, processes=None):
+  tokenized_program, indents, headers = [], [], []
+  for part in _map(_front_end_piece, program, processes):
+    tokenized_program += part[0]
+    indents += part[1]
+    headers += part[2]
+  return tokenized_program, indents, headers
+
+# compact_v2.encode for a big program, with the pieces encoded in parallel and then joined
+def encode(program, processes=None):
+  return compact_v2.join(list(_map(_encode_piece, program, processes)))
+
+# run piece(start, lines) over consecutive pieces of program in a process pool and give back the results
+# in order; exceptions come back as results (the pool would have to format their tracebacks, and the
+# traceback module can't read source files with our tokenize module in place of the standard one)
+def _map(piece, program, processes):
+  processes = processes or os.cpu_count() or 1
+  bounds = _split(program, processes * CHUNKS_PER_PROCESS)
+  jobs = [(piece, start, program[start:end]) for start, end in zip(bounds, bounds[1:])]
+  if processes == 1 or len(jobs) == 1:
+    results = map(_run_piece, jobs)
+  else:
+    with multiprocessing.Pool(min(processes, len(jobs))) as pool:
+      results = pool.map(_run_piece, jobs, chunksize=1)
+  for result in results:
+    if isinstance(result, Exception):
+      raise result
+    yield result
+
+# where the pieces begin, plus the end of the program; every piece but the first starts on a func line
+def _split(program, pieces):
+  size = max(MIN_CHUNK_LINES, -(-len(program) // pieces))
+  bounds = [0]
+  line_num = size
+  while line_num < len(program):
+    while line_num < len(program) and not may_be_header(program[line_num]):
+      line_num += 1
+    if line_num < len(program):
+      bounds.append(line_num)
+    line_num += size
+  bounds.append(len(program))
+  return bounds
+
+def _run_piece(job):
+  piece, start, lines = job
+  try:
+    return piece(start, lines)
+  except Exception as exception:
+    return exception
+
+# tokens (one str object per spelling, so the pickle back to the parent stays small), indentation and
+# header line numbers of one piece
+def _front_end_piece(start, lines):
+  spellings = {}
+  tokenized_lines = []
+  headers = []
+  for line_num, line in enumerate(lines, start):
+    tokens = [spellings.setdefault(token, token) for token in Tokenizer._tokenize(line_num, line.rstrip())]
+    tokenized_lines.append(tokens)
+    if tokens and tokens[0] == InterpreterBase.FUNC_DEF:
+      headers.append(line_num)
+  indents = [len(line) - len(line.lstrip(' ')) for line in lines]
+  return tokenized_lines, indents, headers
+
+def _encode_piece(start, lines):
+  return compact_v2.encode(lines, start)
@@ -0,0 +1,90 @@
+import time
+from hooks_v2 import Hooks
+
+# The Profiler records how many times each source line runs and how much wall time it takes, plus
+# call counts and inclusive/exclusive time for every Brewin function. A line's time runs from its
+# on_line event until the next event, so calls and returns are charged to the stack they happened on.
+class Profiler(Hooks):
+  def __init__(self):
+    self.line_counts = {}     # ip -> times executed
+    self.line_times = {}      # ip -> seconds spent executing that line
+    self.func_calls = {}      # function name -> times called
+    self.func_inclusive = {}  # function name -> seconds from call to return, counted once for recursion
+    self.func_exclusive = {}  # function name -> seconds not spent in the functions it called
+    self.stacks = {}          # "main;foo;bar" -> seconds spent on lines with that call stack
+
+  def on_start(self, interpreter):
+    self.program = interpreter.program
+    self.call_stack = []      # [name, entry time, seconds spent in callees]
+    self.active = {}          # function name -> frames currently on call_stack
+    self.path = []
+    self.pending_ip = None
+    self._enter(interpreter.entry, time.perf_counter())
+
+  def on_line(self, ip):
+    now = time.perf_counter()
+    self._flush(now)
+    self.line_counts[ip] = self.line_counts.get(ip, 0) + 1
+    self.pending_ip = ip
+    self.pending_start = now
+
+  def on_call(self, name, ip, callee_ip):
+    now = time.perf_counter()
+    self._flush(now)
+    self._enter(name, now)
+
+  def on_return(self, ip, return_ip):
+    now = time.perf_counter()
+    self._flush(now)
+    self._exit(now)
+
+  # close whatever frames are still open (just main, unless the program stopped on an error)
+  def on_finish(self):
+    now = time.perf_counter()
+    self._flush(now)
+    while self.call_stack:
+      self._exit(now)
+
+  def _flush(self, now):
+    if self.pending_ip is None:
+      return
+    elapsed = now - self.pending_start
+    self.line_times[self.pending_ip] = self.line_times.get(self.pending_ip, 0) + elapsed
+    stack = ';'.join(self.path)
+    self.stacks[stack] = self.stacks.get(stack, 0) + elapsed
+    self.pending_ip = None
+
+  def _enter(self, name, now):
+    self.func_calls[name] = self.func_calls.get(name, 0) + 1
+    self.active[name] = self.active.get(name, 0) + 1
+    self.call_stack.append([name, now, 0])
+    self.path.append(name)
+
+  def _exit(self, now):
+    name, entered, in_callees = self.call_stack.pop()
+    self.path.pop()
+    inclusive = now - entered
+    self.active[name] -= 1
+    if not self.active[name]:
+      self.func_inclusive[name] = self.func_inclusive.get(name, 0) + inclusive
+    self.func_exclusive[name] = self.func_exclusive.get(name, 0) + inclusive - in_callees
+    if self.call_stack:
+      self.call_stack[-1][2] += inclusive
+
+  # hottest lines by total time, then functions by inclusive time
+  def report(self, limit=20):
+    out = ['Hot lines:', f"{'line':>6} {'count':>10} {'total ms':>10} {'us/hit':>8}  source"]
+    for ip in sorted(self.line_times, key=self.line_times.get, reverse=True)[:limit]:
+      total, count = self.line_times[ip], self.line_counts[ip]
+      out.append(f"{ip:6} {count:10} {total * 1e3:10.3f} {total * 1e6 / count:8.2f}  {self.program[ip].strip()}")
+    out += ['', 'Functions:', f"{'calls':>10} {'incl ms':>10} {'excl ms':>10}  function"]
+    for name in sorted(self.func_calls, key=lambda name: self.func_inclusive.get(name, 0), reverse=True)[:limit]:
+      out.append(f"{self.func_calls[name]:10} {self.func_inclusive.get(name, 0) * 1e3:10.3f} "
+                 f"{self.func_exclusive.get(name, 0) * 1e3:10.3f}  {name}")
+    return '\n'.join(out)
+
+  # one "main;foo;bar <microseconds>" line per call stack, the input flamegraph.pl and speedscope expect
+  def write_collapsed(self, path):
+    with open(path, 'w') as f:
+      for stack, seconds in sorted(self.stacks.items()):
+        f.write(f"{stack} {max(1, round(seconds * 1e6))}\n")
@@ -0,0 +1,119 @@
+# Strings built by + are kept as a tree of the pieces that were concatenated instead of being copied
+# into a new str every time, so building a string in a loop or through recursion (like doubling it
+# with assign s + s s) costs time and memory proportional to the number of + operations, not to the
+# square of the final length. The text is only put together when something needs to look at it:
+# comparisons, print and strtoint.
+
+ROPE_MIN = 256  # results shorter than this are cheaper to just copy
+CHUNK = 4096    # short pieces added to either end are copied into the end chunk up to this size
+
+# joins two string values (str or Rope)
+def concat(a, b):
+  a_length = a.length if type(a) is Rope else len(a)
+  b_length = b.length if type(b) is Rope else len(b)
+  length = a_length + b_length
+  if length < ROPE_MIN:
+    return str(a) + str(b)
+  # growing a string a little at a time would otherwise cost a node per +
+  if type(b) is str and type(a) is Rope and type(a.right) is str and len(a.right) + b_length <= CHUNK:
+    return Rope(a.left, a.right + b, length)
+  if type(a) is str and type(b) is Rope and type(b.left) is str and a_length + len(b.left) <= CHUNK:
+    return Rope(a + b.left, b.right, length)
+  return Rope(a, b, length)
+
+class Rope:
+  __slots__ = ('left', 'right', 'length', 'flat')
+
+  def __init__(self, left, right, length):
+    self.left = left
+    self.right = right
+    self.length = length
+    self.flat = None
+
+  # the full text, put together once and remembered. A string added to itself shares its node between
+  # both sides, so the nodes more than one node points at are joined first, each once, and the rest
+  # copy those joined strings instead of walking below them again
+  def __str__(self):
+    if self.flat is None:
+      for node in self._shared():
+        node._join()
+      self._join()
+    return self.flat
+
+  # the unjoined nodes below this one reached from more than one node, children before parents; the
+  # walks use explicit stacks because a string grown one + at a time is a very deep tree
+  def _shared(self):
+    parents = {id(self): 1}
+    expanded = set()
+    order = []
+    stack = [(self, False)]
+    while stack:
+      node, done = stack.pop()
+      if done:
+        if parents[id(node)] > 1:
+          order.append(node)
+        continue
+      if id(node) in expanded:
+        continue
+      expanded.add(id(node))
+      stack.append((node, True))
+      for child in (node.right, node.left):
+        if type(child) is Rope and child.flat is None:
+          parents[id(child)] = parents.get(id(child), 0) + 1
+          stack.append((child, False))
+    return order
+
+  def _join(self):
+    pieces = []
+    stack = [self.right, self.left]
+    while stack:
+      node = stack.pop()
+      if type(node) is str:
+        pieces.append(node)
+      elif node.flat is not None:
+        pieces.append(node.flat)
+      else:
+        stack.append(node.right)
+        stack.append(node.left)
+    self.flat = ''.join(pieces)
+    self.left = self.right = None  # the pieces are no longer needed
+
+  def __len__(self):
+    return self.length
+
+  def __bool__(self):
+    return self.length > 0
+
+  def __add__(self, other):
+    return concat(self, other)
+
+  def __radd__(self, other):
+    return concat(other, self)
+
+  def __eq__(self, other):
+    return str(self) == str(other)
+
+  def __ne__(self, other):
+    return str(self) != str(other)
+
+  def __lt__(self, other):
+    return str(self) < str(other)
+
+  def __le__(self, other):
+    return str(self) <= str(other)
+
+  def __gt__(self, other):
+    return str(self) > str(other)
+
+  def __ge__(self, other):
+    return str(self) >= str(other)
+
+  def __hash__(self):
+    return hash(str(self))
+
+  def __repr__(self):
+    return repr(str(self))
+
+  # pickled as the text, which also keeps very deep ropes from overflowing pickle's recursion
+  def __reduce__(self):
+    return (str, (str(self),))
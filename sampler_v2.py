@@ -0,0 +1,107 @@
+import bisect
+import signal
+from intbase import InterpreterBase
+from source_v2 import MappedSource
+
+# SamplingProfiler finds where runs spend their time without watching every statement: a SIGPROF
+# timer fires every interval seconds of CPU time, and the handler notes the interpreter's ip and a
+# copy of its return stack. Nothing else is added to the run, so the cost is one tuple per sample and
+# it can be left on all the time. Samples are turned into source lines and function names when the
+# run ends, and accumulate over every run of the same program given this profiler; reset() starts
+# over. Timers and signal handlers are Unix-only and only work on the main thread.
+class SamplingProfiler:
+  def __init__(self, interval=0.005):
+    self.interval = interval
+    self.program = None
+    self.reset()
+
+  def reset(self):
+    self.samples = 0
+    self.line_samples = {}     # ip -> samples taken while it was executing
+    self.func_self = {}        # function name -> samples taken in its own lines
+    self.func_inclusive = {}   # function name -> samples taken with it anywhere on the stack
+    self.stacks = {}           # "main;foo;bar" -> samples taken with that call stack
+    self.raw = {}              # (ip, return stack) -> samples, until _resolve names them
+
+  # begin sampling interpreter, which is ready to execute its program
+  def start(self, interpreter):
+    if not self._same_program(interpreter.program):
+      self.reset()
+      program = interpreter.program
+      self.program = program if type(program) is MappedSource else list(program)
+      self._index_functions()
+    self.interpreter = interpreter
+    self.previous_handler = signal.signal(signal.SIGPROF, self._sample)
+    signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+  # whether the samples so far are of program: a mapped file is known by its path, as run_file maps it
+  # afresh each time, and a list by its lines, as the caller may have edited it in place since
+  def _same_program(self, program):
+    if type(program) is MappedSource or type(self.program) is MappedSource:
+      return type(program) is type(self.program) and program.path == self.program.path
+    return program == self.program
+
+  def stop(self):
+    signal.setitimer(signal.ITIMER_PROF, 0)
+    signal.signal(signal.SIGPROF, self.previous_handler)
+    self.interpreter = None
+    self._resolve()
+
+  def _sample(self, signum, frame):
+    interpreter = self.interpreter
+    if interpreter is not None:
+      key = (interpreter.ip, tuple(interpreter.return_stack))
+      self.raw[key] = self.raw.get(key, 0) + 1
+
+  # the first line of every function and its name, for finding the function a line belongs to; of a
+  # mapped file only the lines with func in them are decoded
+  def _index_functions(self):
+    self.func_starts = []
+    self.func_names = []
+    if type(self.program) is MappedSource:
+      line_nums = self.program.lines_with(InterpreterBase.FUNC_DEF)
+    else:
+      line_nums = range(len(self.program))
+    for line_num in line_nums:
+      words = self.program[line_num].split(InterpreterBase.COMMENT_DEF)[0].split()
+      if len(words) > 1 and words[0] == InterpreterBase.FUNC_DEF:
+        self.func_starts.append(line_num)
+        self.func_names.append(words[1])
+
+  def _function_at(self, ip):
+    index = bisect.bisect_right(self.func_starts, ip) - 1
+    return self.func_names[index] if index >= 0 else '?'
+
+  # a return address is the line after the caller's funccall; call()'s marker has no Brewin caller
+  def _resolve(self):
+    for (ip, return_stack), count in self.raw.items():
+      path = [self._function_at(return_ip - 1) for return_ip in return_stack if return_ip >= 0]
+      path.append(self._function_at(ip))
+      self.samples += count
+      self.line_samples[ip] = self.line_samples.get(ip, 0) + count
+      self.func_self[path[-1]] = self.func_self.get(path[-1], 0) + count
+      for name in set(path):
+        self.func_inclusive[name] = self.func_inclusive.get(name, 0) + count
+      stack = ';'.join(path)
+      self.stacks[stack] = self.stacks.get(stack, 0) + count
+    self.raw = {}
+
+  # hottest lines, then functions by inclusive samples; times are estimates, samples times interval
+  def report(self, limit=20):
+    total = self.samples or 1
+    out = [f"{self.samples} samples, one every {self.interval * 1e3:g} ms of CPU time", '', 'Hot lines:',
+           f"{'line':>6} {'samples':>8} {'%':>6} {'~ms':>8}  source"]
+    for ip in sorted(self.line_samples, key=self.line_samples.get, reverse=True)[:limit]:
+      count = self.line_samples[ip]
+      out.append(f"{ip:6} {count:8} {count * 100 / total:6.1f} {count * self.interval * 1e3:8.1f}  {self.program[ip].strip()}")
+    out += ['', 'Functions:', f"{'self':>8} {'self %':>7} {'incl':>8} {'incl %':>7}  function"]
+    for name in sorted(self.func_inclusive, key=self.func_inclusive.get, reverse=True)[:limit]:
+      own, inclusive = self.func_self.get(name, 0), self.func_inclusive[name]
+      out.append(f"{own:8} {own * 100 / total:7.1f} {inclusive:8} {inclusive * 100 / total:7.1f}  {name}")
+    return '\n'.join(out)
+
+  # one "main;foo;bar <samples>" line per call stack, the input flamegraph.pl and speedscope expect
+  def write_collapsed(self, path):
+    with open(path, 'w') as f:
+      for stack, count in sorted(self.stacks.items()):
+        f.write(f"{stack} {count}\n")
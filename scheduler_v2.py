@@ -0,0 +1,67 @@
+import copy
+from interpreterv2 import Interpreter
+import asyncio   # after the interpreter: asyncio pulls in the standard tokenize module, which ours replaces
+
+WATCHERS = ('hooks', 'sampler', 'trace_file')   # interpreter arguments that record one run at a time
+
+# Scheduler hosts many Brewin runs on one event loop. Each run goes through Interpreter.run_async, which
+# gives the loop back every yield_every statements; the loop resumes runs in the order they yielded, so
+# every runnable program gets the same number of statements per turn however long it has been going,
+# and a run waiting on input costs nothing until its input arrives. If max_running is set, runs beyond
+# that many wait for a free slot in the order they were submitted. Interpreters are created with
+# interpreter_args (console output off unless asked for). Every run counts against its own copy of the
+# limits; hooks, samplers and trace files follow one run at a time, so they can only be given to run(),
+# and not to two runs that overlap.
+class Scheduler:
+  def __init__(self, max_running=None, yield_every=1024, **interpreter_args):
+    shared = [name for name in WATCHERS if interpreter_args.get(name)]
+    if shared:
+      raise ValueError(f"{', '.join(shared)} would be shared by every run; pass them to run() instead")
+    self.yield_every = yield_every
+    self.interpreter_args = dict({'console_output': False}, **interpreter_args)
+    self.slots = asyncio.Semaphore(max_running) if max_running else None
+    self.running = 0
+    self.watching = set()   # the hooks, samplers and trace files of the runs that have yet to finish
+
+  # run program to the end and return its Interpreter, for get_output() and the like; a program that
+  # stops on an error raises it, with the error type and line set on the interpreter as usual
+  async def run(self, program, input_provider=None, **interpreter_args):
+    args = dict(self.interpreter_args, **interpreter_args)
+    if args.get('limits'):
+      args['limits'] = copy.copy(args['limits'])   # Limits.start resets the counters of whoever shares it
+    watchers = self._watchers(args)
+    if self.watching & watchers:
+      raise ValueError("a hook, sampler or trace file is already recording another run")
+    self.watching |= watchers
+    try:
+      interpreter = Interpreter(**args)
+      if self.slots:
+        async with self.slots:
+          await self._run(interpreter, program, input_provider)
+      else:
+        await self._run(interpreter, program, input_provider)
+    finally:
+      self.watching -= watchers
+    return interpreter
+
+  async def _run(self, interpreter, program, input_provider):
+    self.running += 1
+    try:
+      await interpreter.run_async(program, input_provider, self.yield_every)
+    finally:
+      self.running -= 1
+
+  def _watchers(self, args):
+    watchers = set(id(hook) for hook in args.get('hooks') or [])
+    if args.get('sampler'):
+      watchers.add(id(args['sampler']))
+    if args.get('trace_file'):
+      watchers.add(args['trace_file'])
+    return watchers
+
+  # run every program at once; gives back each one's Interpreter, or the exception it stopped with.
+  # input_providers, if given, holds one provider (or None) per program.
+  async def run_all(self, programs, input_providers=None):
+    input_providers = input_providers or [None] * len(programs)
+    runs = [self.run(program, input_provider) for program, input_provider in zip(programs, input_providers)]
+    return await asyncio.gather(*runs, return_exceptions=True)
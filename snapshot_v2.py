@@ -0,0 +1,87 @@
+import io
+import os
+import pickle
+import zlib
+from hooks_v2 import Hooks
+
+MAGIC = b'BRWS\x02'
+# the only classes a snapshot may contain; ropes are saved as plain strs
+ALLOWED = {('val_v2', 'Value'), ('val_v2', 'Type'), ('builtins', 'str')}
+
+# A snapshot is everything a run needs to carry on from the statement at ip: the source, ip, the return
+# stack, every frame and scope of the environment and each frame's return register, the function table's default return Values (a bare
+# return hands the function's own Value to the caller, so they can be shared with variables), and the
+# input and output so far. All of it goes through one pickle, so Values shared between names, and the
+# caller Values that ref parameters point at, are still shared after a restore.
+
+# the state of interpreter's current run as bytes
+def snapshot(interpreter):
+  returns = dict((name, func_info.return_var) for name, func_info in interpreter.func_manager.func_cache.items())
+  state = {
+    'environment': interpreter.env_manager.environment,   # first, so the ref chains between frames stay shallow
+    'return_vars': interpreter.env_manager.return_vars,
+    'returns': returns,
+    'program': list(interpreter.program),
+    'ip': interpreter.ip,
+    'return_stack': interpreter.return_stack,
+    'input': interpreter.input,
+    'input_cursor': interpreter.input_cursor,
+    'output_log': interpreter.output_log,
+  }
+  return MAGIC + zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+
+# put interpreter in the state a snapshot was taken in, ready to execute the statement at its ip
+def restore(interpreter, data):
+  if data[:len(MAGIC)] != MAGIC:
+    raise ValueError("Not a Brewin snapshot")
+  state = _Unpickler(io.BytesIO(zlib.decompress(data[len(MAGIC):]))).load()
+  compiled = getattr(interpreter, 'source', None) or getattr(interpreter, 'program', None)
+  if compiled != state['program']:   # restoring into the program that is already compiled is common
+    interpreter._compile(state['program'], False)
+  for name, return_var in state['returns'].items():
+    interpreter.func_manager.func_cache[name].return_var = return_var
+  interpreter.env_manager = interpreter._new_environment()
+  interpreter.env_manager.environment = state['environment']
+  interpreter.env_manager.return_vars = state['return_vars']
+  interpreter.ip = state['ip']
+  interpreter.return_stack = state['return_stack']
+  interpreter.terminate = False
+  interpreter.input = state['input']
+  interpreter.input_cursor = state['input_cursor']
+  interpreter.output_log = state['output_log']
+  interpreter.error_type = interpreter.error_line = None
+
+# write data to path so that a crash part way through leaves any earlier snapshot there intact
+def write(path, data):
+  temp_path = f"{path}.tmp"
+  with open(temp_path, 'wb') as f:
+    f.write(data)
+  os.replace(temp_path, path)
+
+def read(path):
+  with open(path, 'rb') as f:
+    return f.read()
+
+# snapshots are only ever made of Values and plain data, so refuse anything else rather than run it
+class _Unpickler(pickle.Unpickler):
+  def find_class(self, module, name):
+    if (module, name) not in ALLOWED:
+      raise pickle.UnpicklingError(f"Unexpected {module}.{name} in snapshot")
+    return super().find_class(module, name)
+
+# Checkpointer writes a snapshot of the run to path every `every` statements, taken just before the
+# statement runs, so Interpreter.resume(snapshot_v2.read(path)) picks up with that statement
+class Checkpointer(Hooks):
+  def __init__(self, path, every=100000):
+    self.path = path
+    self.every = every
+
+  def on_start(self, interpreter):
+    self.interpreter = interpreter
+    self.countdown = self.every
+
+  def on_line(self, ip):
+    self.countdown -= 1
+    if not self.countdown:
+      self.countdown = self.every
+      write(self.path, snapshot(self.interpreter))
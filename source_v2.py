@@ -0,0 +1,60 @@
+import bisect
+import mmap
+from array import array
+
+# MappedSource is a Brewin source file as a read-only list of its lines, without reading the file into
+# Python strings: the file is memory-mapped, one pass records where every line starts, and a line is
+# decoded from the mapping each time it is asked for. Lines end at \n, and a \r before it is dropped,
+# so line numbers are the ones f.read().splitlines() gives for files with \n or \r\n line endings.
+class MappedSource:
+  def __init__(self, path):
+    self.path = path
+    with open(path, 'rb') as f:
+      size = f.seek(0, 2)
+      self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+    self.starts = array('Q', [0])   # line i is data[starts[i]:starts[i + 1]], less its line ending
+    find = self.data.find
+    end = find(b'\n')
+    while end != -1:
+      self.starts.append(end + 1)
+      end = find(b'\n', end + 1)
+    if self.starts[-1] != len(self.data):   # unless the file ends in a newline, end the last line as if it did
+      self.starts.append(len(self.data) + 1)
+
+  def __len__(self):
+    return len(self.starts) - 1
+
+  def __getitem__(self, index):
+    if type(index) is slice:
+      return [self._line(line_num) for line_num in range(*index.indices(len(self)))]
+    if index < 0:
+      index += len(self)
+    if not 0 <= index < len(self):
+      raise IndexError("line number out of range")
+    return self._line(index)
+
+  def __iter__(self):
+    for line_num in range(len(self)):
+      yield self._line(line_num)
+
+  # the numbers of the lines whose text contains word, found by searching the mapping, so that scans
+  # for a keyword only decode the lines that might have it
+  def lines_with(self, word):
+    needle = word.encode()
+    found = []
+    at = self.data.find(needle)
+    while at != -1:
+      line_num = bisect.bisect_right(self.starts, at) - 1
+      found.append(line_num)
+      at = self.data.find(needle, self.starts[line_num + 1])
+    return found
+
+  def _line(self, line_num):
+    line = self.data[self.starts[line_num]:self.starts[line_num + 1] - 1]
+    if line.endswith(b'\r'):
+      line = line[:-1]
+    return line.decode()
+
+  def close(self):
+    if self.data:
+      self.data.close()
@@ -0,0 +1,164 @@
+import json
+from intbase import InterpreterBase
+from env_v2 import EnvironmentManager
+from val_v2 import Value
+from hooks_v2 import Hooks
+
+# RuntimeStats counts what the interpreter does internally during a run: statements by opcode,
+# variable lookups, scope churn, Value allocations, calls and reference copy-backs. It watches the run
+# as a hook, through a counting EnvironmentManager and through the function the interpreter makes its
+# Values with, so runs without stats pay nothing for it.
+class RuntimeStats(Hooks):
+  BUILTINS = {InterpreterBase.PRINT_DEF, InterpreterBase.INPUT_DEF, InterpreterBase.STRTOINT_DEF}
+
+  def __init__(self):
+    self.reset()
+
+  # every run starts counting from zero
+  def reset(self):
+    self.statements = {}            # opcode -> statements executed, blank lines under 'blank'
+    self.env_gets = 0
+    self.scopes_probed = 0          # block scopes looked at by all the env_gets together
+    self.scopes_pushed = 0
+    self.scopes_popped = 0
+    self.values_created = 0
+    self.function_calls = 0         # calls into Brewin functions
+    self.builtin_calls = 0          # print, input and strtoint
+    self.reference_copy_backs = 0   # ref parameters written back to the caller by update_references
+    self.peak_return_stack_depth = 0
+    self.live_variables = 0
+    self.peak_live_variables = 0
+
+  # the environment manager the interpreter should use for a run being counted
+  def environment(self):
+    return CountingEnvironmentManager(self)
+
+  # what the interpreter should make Values with instead of the Value class, to have them counted here
+  def value_factory(self):
+    def new_value(type, value=None, ref=None):
+      self.values_created += 1
+      return Value(type, value, ref)
+    return new_value
+
+  def on_start(self, interpreter):
+    self.reset()
+    self.interpreter = interpreter
+    self.tokenized_program = interpreter.tokenized_program
+
+  def on_line(self, ip):
+    tokens = self.tokenized_program[ip]
+    opcode = tokens[0] if tokens else 'blank'
+    self.statements[opcode] = self.statements.get(opcode, 0) + 1
+    if opcode == InterpreterBase.FUNCCALL_DEF and tokens[1] in self.BUILTINS:
+      self.builtin_calls += 1
+
+  def on_call(self, name, ip, callee_ip):
+    self.function_calls += 1
+    self.peak_return_stack_depth = max(self.peak_return_stack_depth, len(self.interpreter.return_stack))
+
+  def _add_live(self, count):
+    self.live_variables += count
+    if self.live_variables > self.peak_live_variables:
+      self.peak_live_variables = self.live_variables
+
+  def as_dict(self):
+    return {
+      'statements': dict(self.statements),
+      'statements_total': sum(self.statements.values()),
+      'env_gets': self.env_gets,
+      'avg_scope_depth_probed': self.scopes_probed / self.env_gets if self.env_gets else 0,
+      'scopes_pushed': self.scopes_pushed,
+      'scopes_popped': self.scopes_popped,
+      'values_created': self.values_created,
+      'function_calls': self.function_calls,
+      'builtin_calls': self.builtin_calls,
+      'reference_copy_backs': self.reference_copy_backs,
+      'peak_return_stack_depth': self.peak_return_stack_depth,
+      'peak_live_variables': self.peak_live_variables,
+    }
+
+  def to_json(self):
+    return json.dumps(self.as_dict(), sort_keys=True)
+
+# combines the as_dict() results of many runs: counts are summed, peaks take the maximum and the
+# average probe depth is weighted by each run's env_gets
+def aggregate(stats_dicts):
+  total = {'runs': 0, 'statements': {}}
+  probed = 0
+  for stats in stats_dicts:
+    total['runs'] += 1
+    for key, value in stats.items():
+      if key == 'statements':
+        for opcode, count in value.items():
+          total['statements'][opcode] = total['statements'].get(opcode, 0) + count
+      elif key.startswith('peak_'):
+        total[key] = max(total.get(key, 0), value)
+      elif key != 'avg_scope_depth_probed':
+        total[key] = total.get(key, 0) + value
+    probed += stats['avg_scope_depth_probed'] * stats['env_gets']
+  total['avg_scope_depth_probed'] = probed / total['env_gets'] if total.get('env_gets') else 0
+  return total
+
+# EnvironmentManager that reports lookups, scope changes, live variables and copy-backs to a RuntimeStats
+class CountingEnvironmentManager(EnvironmentManager):
+  def __init__(self, stats):
+    super().__init__()
+    self.stats = stats
+
+  def get(self, symbol, only_curr_scope=False):
+    self.stats.env_gets += 1
+    if only_curr_scope:
+      self.stats.scopes_probed += 1
+      return self.environment[-1][-1].get(symbol, None)
+    for env in self.environment[-1][::-1]:
+      self.stats.scopes_probed += 1
+      data = env.get(symbol, None)
+      if data is not None:
+        return data
+    return None
+
+  def get_result(self, symbol):
+    self.stats.env_gets += 1
+    self.stats.scopes_probed += 1
+    return super().get_result(symbol)
+
+  # only a set into the current scope or into a function's outermost scope can add a new name
+  def set(self, symbol, value, func_scope=-1, only_curr_scope=False, res=False):
+    if func_scope == -1 and not res:
+      scope = self.environment[-1][-1] if only_curr_scope else None
+    else:
+      scope = self.environment[func_scope][0]
+    new = scope is not None and symbol not in scope
+    super().set(symbol, value, func_scope, only_curr_scope, res)
+    if new:
+      self.stats._add_live(1)
+
+  def update_references(self):
+    for env in self.environment[-1]:
+      for v in env.values():
+        if v != 'void' and v.r is not None:
+          self.stats.reference_copy_backs += 1
+    super().update_references()
+
+  def new_func_scope(self, params={}, return_var=None):
+    super().new_func_scope(params, return_var)
+    self.stats._add_live(len(params))
+
+  def set_result(self, symbol, value, func_scope=-1):
+    new = symbol not in self.environment[func_scope][0]
+    super().set_result(symbol, value, func_scope)
+    if new:
+      self.stats._add_live(1)
+
+  def pop_env(self):
+    self.stats._add_live(-sum(len(scope) for scope in self.environment[-1]))
+    super().pop_env()
+
+  def nest_new_scope(self):
+    self.stats.scopes_pushed += 1
+    super().nest_new_scope()
+
+  def remove_innermost_scope(self):
+    self.stats.scopes_popped += 1
+    self.stats._add_live(-len(self.environment[-1][-1]))
+    super().remove_innermost_scope()
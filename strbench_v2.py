@@ -0,0 +1,67 @@
+import sys
+import time
+from interpreterv2 import Interpreter
+import rope_v2
+import tracemalloc   # after the interpreter: tracemalloc pulls in the standard tokenize module, which ours replaces
+
+# Times the string-building programs ropes are for, with ropes and with every + copying into a new str
+# as it did before them (rope_v2.ROPE_MIN raised past any length). Both print what they built, so the
+# cost of flattening the rope is in the rope times.
+
+# doubles a string through a refstring parameter count times, like the double sample, then prints it
+def double(count):
+  return ['func double r:refstring void', ' assign r + r r', 'endfunc',
+          'func main void', ' var string result', ' assign result "ab"', ' var int i', ' assign i 0',
+          f' while < i {count}', '  funccall double result', '  assign i + i 1', ' endwhile',
+          ' funccall print result', 'endfunc']
+
+# appends a short string count times, then prints the result
+def append(count):
+  return ['func main void', ' var string s', ' var int i', ' assign i 0',
+          f' while < i {count}', '  assign s + s "xy"', '  assign i + i 1', ' endwhile',
+          ' funccall print s', 'endfunc']
+
+PROGRAMS = {'double': (double, [16, 20, 22]), 'append': (append, [10000, 50000, 100000])}
+
+# (fastest of repeat runs in seconds, peak bytes allocated) of program, with ropes or without
+def measure(program, ropes, repeat=3):
+  rope_min = rope_v2.ROPE_MIN
+  if not ropes:
+    rope_v2.ROPE_MIN = float('inf')
+  try:
+    seconds = None
+    for _ in range(repeat):
+      interpreter = Interpreter(console_output=False)
+      start = time.perf_counter()
+      interpreter.run(program)
+      elapsed = time.perf_counter() - start
+      seconds = elapsed if seconds is None else min(seconds, elapsed)
+    interpreter = Interpreter(console_output=False)
+    tracemalloc.start()
+    try:
+      interpreter.run(program)
+      peak = tracemalloc.get_traced_memory()[1]
+    finally:
+      tracemalloc.stop()
+  finally:
+    rope_v2.ROPE_MIN = rope_min
+  return seconds, peak
+
+def print_bench(name, out=sys.stdout):
+  make, counts = PROGRAMS[name]
+  print(f"{name:>8}{'count':>8}{'copy ms':>10}{'rope ms':>10}{'copy KB':>10}{'rope KB':>10}", file=out)
+  for count in counts:
+    copy_seconds, copy_peak = measure(make(count), False)
+    rope_seconds, rope_peak = measure(make(count), True)
+    print(f"{'':>8}{count:>8}{copy_seconds * 1e3:>10.1f}{rope_seconds * 1e3:>10.1f}"
+          f"{copy_peak / 1024:>10.0f}{rope_peak / 1024:>10.0f}", file=out)
+
+if __name__ == "__main__":
+  names = sys.argv[1:] or list(PROGRAMS)
+  for name in names:
+    if name not in PROGRAMS:
+      print(f"usage: python strbench_v2.py [{' | '.join(PROGRAMS)}] ...")
+      sys.exit(1)
+  for name in names:
+    print_bench(name)
+    print()
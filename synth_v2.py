@@ -0,0 +1,119 @@
+import sys
+import time
+from interpreterv2 import Interpreter
+import tracemalloc   # after the interpreter: tracemalloc pulls in the standard tokenize module, which ours replaces
+
+# generate()'s shape parameters and their defaults; a sweep varies one of them and keeps the rest here
+DEFAULTS = {'lines': 2000, 'functions': 8, 'depth': 2, 'recursion': 20, 'variables': 4, 'refs': 0.25, 'string_size': 16}
+SWEEPS = {
+  'lines': [1000, 2000, 4000, 8000, 16000],
+  'functions': [1, 4, 16, 64, 256],
+  'depth': [0, 2, 4, 8, 16],
+  'recursion': [10, 50, 100, 200, 400],
+  'variables': [1, 4, 16, 64],
+  'refs': [0, 0.25, 0.5, 1],
+  'string_size': [10, 100, 1000, 10000],
+}
+PARAMS = 4  # parameters of every generated function
+
+# A generated program has `functions` functions that main calls once each, plus a function that calls
+# itself `recursion` deep. Every function takes PARAMS int parameters, the first refs * PARAMS of them
+# by reference, and nests `depth` blocks (alternately an if and a while that runs once), declaring
+# `variables` ints in each scope. The statements that fill the program up to `lines` lines sit in the
+# innermost block and add up variables from every scope, concatenate strings of string_size
+# characters and write the parameters, so the cost of lookups, loops and ref copy-backs grows with the
+# parameters that control them. Programs always run to the end without an error.
+def generate(lines=2000, functions=8, depth=2, recursion=20, variables=4, refs=0.25, string_size=16):
+  by_ref = round(refs * PARAMS)
+  bodies = [_function(f"f{n}", depth, variables, by_ref, string_size) for n in range(functions)]
+  main = ['func main void', ' var int ' + ' '.join(f"m{j}" for j in range(PARAMS))]
+  for n in range(functions):
+    main.append(f" funccall f{n} " + ' '.join(f"m{j}" for j in range(PARAMS)))
+  if recursion:
+    main += [f" funccall recurse {recursion}", ' funccall print resulti']
+  main += [' funccall print ' + ' '.join(f"m{j}" for j in range(PARAMS)), 'endfunc']
+  recurse = ['func recurse n:int int', ' if == n 0', '  return 0', ' endif', ' var int next', ' assign next - n 1',
+             ' funccall recurse next', ' return + resulti 1', 'endfunc'] if recursion else []
+  fixed = sum(len(head) + len(tail) for head, _, tail in bodies) + len(main) + len(recurse)
+  work = max(0, lines - fixed)
+  program = []
+  for n, (head, make_statement, tail) in enumerate(bodies):
+    count = work // functions + (n < work % functions)
+    program += head + [make_statement(i) for i in range(count)] + tail
+  return program + recurse + main
+
+# the lines of a function up to and after its innermost block, and what makes the statements in it
+def _function(name, depth, variables, by_ref, string_size):
+  params = ' '.join(f"p{j}:{'refint' if j < by_ref else 'int'}" for j in range(PARAMS))
+  head = [f"func {name} {params} int", ' var string s t', f' assign s "{"x" * string_size}"']
+  tail = [' funccall print v0_0 t', ' return v0_0', 'endfunc']
+  head.insert(1, ' var int ' + ' '.join(f"v0_{k}" for k in range(variables)))
+  for level in range(1, depth + 1):
+    indent = ' ' * level
+    if level % 2:
+      head.append(f"{indent}if >= v0_0 0")
+      tail.insert(0, f"{indent}endif")
+    else:
+      head += [f"{indent}var int w{level}", f"{indent}while < w{level} 1"]
+      tail[:0] = [f"{indent} assign w{level} + w{level} 1", f"{indent}endwhile"]
+    head.append(f"{indent} var int " + ' '.join(f"v{level}_{k}" for k in range(variables)))
+  indent = ' ' * (depth + 1)
+  def make_statement(i):
+    kind = i % 3
+    if kind == 0:
+      return f"{indent}assign v{depth}_{i % variables} + v{depth}_{i % variables} v0_{(i + 1) % variables}"
+    if kind == 1:
+      return f'{indent}assign t + s "y"'
+    return f"{indent}assign p{i % PARAMS} + p{i % PARAMS} 1"
+  return head, make_statement, tail
+
+# run generate(**shape) and give back (lines, seconds, peak bytes allocated); the time and the memory
+# come from separate runs, since tracing allocations slows the run down
+def measure(shape, repeat=1, **interpreter_args):
+  program = generate(**shape)
+  seconds = None
+  for _ in range(repeat):
+    interpreter = Interpreter(**dict({'console_output': False}, **interpreter_args))
+    start = time.perf_counter()
+    interpreter.run(program)
+    elapsed = time.perf_counter() - start
+    seconds = elapsed if seconds is None else min(seconds, elapsed)
+  interpreter = Interpreter(**dict({'console_output': False}, **interpreter_args))
+  tracemalloc.start()
+  try:
+    interpreter.run(program)
+    peak = tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+  return len(program), seconds, peak
+
+# measure programs with parameter set to each of values (SWEEPS' by default) and the rest at DEFAULTS;
+# returns [(value, lines, seconds, peak bytes)]
+def sweep(parameter, values=None, repeat=1, **interpreter_args):
+  rows = []
+  for value in values or SWEEPS[parameter]:
+    shape = dict(DEFAULTS, **{parameter: value})
+    rows.append((value,) + measure(shape, repeat, **interpreter_args))
+  return rows
+
+# print a sweep as a table; the last column is how much worse than linear in value the time grew
+# since the previous row (1.00 is linear, and parameters that don't change the line count should be flat)
+def print_sweep(parameter, rows, out=sys.stdout):
+  print(f"{parameter:>12}{'lines':>8}{'ms':>10}{'peak KB':>10}{'growth':>8}", file=out)
+  previous = None
+  for value, lines, seconds, peak in rows:
+    growth = ''
+    if previous and previous[0] and value:
+      growth = f"{(seconds / previous[2]) / (value / previous[0]):.2f}"
+    print(f"{value:>12}{lines:>8}{seconds * 1e3:>10.1f}{peak / 1024:>10.0f}{growth:>8}", file=out)
+    previous = (value, lines, seconds)
+
+if __name__ == "__main__":
+  parameters = sys.argv[1:] or list(SWEEPS)
+  for parameter in parameters:
+    if parameter not in SWEEPS:
+      print(f"usage: python synth_v2.py [{' | '.join(SWEEPS)}] ...")
+      sys.exit(1)
+  for parameter in parameters:
+    print_sweep(parameter, sweep(parameter))
+    print()
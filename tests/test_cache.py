@@ -0,0 +1,24 @@
+from interpreterv2 import Interpreter
+from cache_v2 import ResultCache
+
+def test_programs_that_read_stdin_are_not_cached(tmp_path):
+  interpreter = Interpreter(console_output=False, cache=ResultCache(str(tmp_path)))
+  assert not interpreter._cacheable(['func main void', ' funccall input"name? "', 'endfunc'])
+  assert not interpreter._cacheable(['func main void', ' funccall   input # no prompt', 'endfunc'])
+  assert interpreter._cacheable(['func main void', ' funccall print "funccall input"', 'endfunc'])
+  assert interpreter._cacheable(['func main void', ' var int inputs', 'endfunc'])
+
+def test_files_are_cached_until_they_change(tmp_path):
+  cache = ResultCache(str(tmp_path / 'cache'))
+  path = tmp_path / 'program.brewin'
+  path.write_text('func main void\n funccall print "one"\nendfunc\n')
+  for _ in range(2):
+    interpreter = Interpreter(console_output=False, cache=cache)
+    interpreter.run_file(str(path))
+    assert interpreter.get_output() == ['one']
+  assert (cache.hits, cache.misses) == (1, 1)
+  path.write_text('func main void\n funccall print "two"\nendfunc\n')
+  interpreter = Interpreter(console_output=False, cache=cache)
+  interpreter.run_file(str(path))
+  assert interpreter.get_output() == ['two']
+  assert (cache.hits, cache.misses) == (1, 2)
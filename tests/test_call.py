@@ -0,0 +1,47 @@
+import pytest
+from interpreterv2 import Interpreter
+from val_v2 import Ref
+
+PROGRAM = ['func add a:int b:int int',
+           ' return + a b',
+           'endfunc',
+           'func bare_bool bool',
+           ' return',
+           'endfunc',
+           'func bare_string string',
+           ' return',
+           'endfunc',
+           'func bare_int int',
+           ' return',
+           'endfunc',
+           'func passed_on bool',
+           ' funccall bare_bool',
+           ' return resultb',
+           'endfunc',
+           'func append s:refstring void',
+           ' assign s + s "!"',
+           'endfunc']
+
+@pytest.fixture(params=[{}, {'fast_paths': True}, {'fail_fast': True}])
+def interpreter(request):
+  interpreter = Interpreter(console_output=False, **request.param)
+  interpreter.load(PROGRAM)
+  return interpreter
+
+def test_results_come_back_as_python_values(interpreter):
+  assert interpreter.call('add', 2, 3) == 5
+
+def test_bare_returns_give_the_default_value(interpreter):
+  assert interpreter.call('bare_bool') is False
+  assert interpreter.call('bare_string') == ''
+  assert interpreter.call('bare_int') == 0
+  assert interpreter.call('passed_on') is False
+
+def test_refs_are_updated(interpreter):
+  text = Ref('hi')
+  assert interpreter.call('append', text) is None
+  assert text.value == 'hi!'
+
+def test_call_needs_a_program():
+  with pytest.raises(ValueError):
+    Interpreter(console_output=False).call('add', 1, 2)
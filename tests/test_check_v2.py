@@ -0,0 +1,122 @@
+import pytest
+from interpreterv2 import Interpreter
+from intbase import ErrorType
+
+ADD = ['func add a:int b:int int',
+       ' return + a b',
+       'endfunc',
+       'func main void',
+       ' var int i s',
+       ' assign i 0',
+       ' while < i 40',
+       '  funccall add s i',
+       '  assign s resulti',
+       '  assign i + i 1',
+       ' endwhile',
+       ' funccall print s',
+       'endfunc']
+
+# g is called with its a from one place and without it from another, so its assign can't be proven either way
+MIXED = ['func g a:int void',
+         ' var int x',
+         ' assign x + a 1',
+         'endfunc',
+         'func main void',
+         ' funccall g 1',
+         ' funccall print "called"',
+         ' funccall g',
+         'endfunc']
+
+# the error is on the line after a print, which fail_fast never gets to run
+LATE_ERROR = ['func main void',
+              ' funccall print "before"',
+              ' var int x',
+              ' assign x + 1 "a"',
+              'endfunc']
+
+# f's if has no endif of its own, so when it is false f carries on after g's endif, where its a is a string
+JUMPS_INTO_G = ['func main void',
+                ' var int i',
+                ' assign i 0',
+                ' while < i 5',
+                '  funccall g i',
+                '  assign i + i 1',
+                ' endwhile',
+                ' funccall f',
+                'endfunc',
+                'func f void',
+                ' var string a',
+                ' assign a "x"',
+                ' if False',
+                'endfunc',
+                'func g a:int void',
+                ' if True',
+                ' endif',
+                ' assign a - a 1',
+                ' funccall print a',
+                'endfunc']
+
+# run program, returning the interpreter and the exception the run ended with, if any
+def run(program, hot=None, **kwargs):
+  interpreter = Interpreter(console_output=False, **kwargs)
+  if hot is not None:
+    interpreter.HOT = hot
+  try:
+    interpreter.run(program)
+  except Exception as e:
+    return interpreter, e
+  return interpreter, None
+
+def test_fail_fast_proves_the_lines_of_a_well_typed_program():
+  interpreter, error = run(ADD, fail_fast=True)
+  assert error is None
+  assert interpreter.get_output() == ['780']
+  statements = [line_num for line_num, line in enumerate(ADD) if not line.startswith(('func ', 'endfunc'))]
+  assert [line_num for line_num in statements if not interpreter.proven[line_num]] == [8]   # resulti is only set if add returns
+
+def test_lines_some_call_breaks_stay_unproven():
+  interpreter, error = run(MIXED, fail_fast=True)
+  assert not interpreter.proven[2]
+  assert interpreter.proven[6]
+  assert interpreter.checker.errors == []   # one caller passes a, so the assign needn't fail
+  assert interpreter.get_output() == ['called']
+  assert interpreter.get_error_type_and_line() == (ErrorType.NAME_ERROR, 2)
+
+def test_fail_fast_reports_errors_before_running():
+  interpreter, error = run(LATE_ERROR, fail_fast=True)
+  assert error is not None
+  assert interpreter.get_output() == []
+  assert interpreter.get_error_type_and_line() == (ErrorType.TYPE_ERROR, 3)
+
+def test_without_fail_fast_the_same_error_comes_when_the_line_runs():
+  for kwargs in ({}, {'fast_paths': True}):
+    interpreter, error = run(LATE_ERROR, **kwargs)
+    assert error is not None
+    assert interpreter.get_output() == ['before']
+    assert interpreter.get_error_type_and_line() == (ErrorType.TYPE_ERROR, 3)
+
+def test_fast_paths_checks_nothing_up_front():
+  interpreter = Interpreter(console_output=False, fast_paths=True)
+  interpreter.load(ADD)
+  assert not any(interpreter.proven)
+  assert interpreter.unchecked == {'add', 'main'}
+
+def test_fast_paths_proves_hot_functions_only():
+  program = ADD[:-1] + [' funccall cold', 'endfunc', 'func cold void', ' var int x', ' assign x 1', 'endfunc']
+  interpreter, error = run(program, fast_paths=True)
+  plain, _ = run(program)
+  assert error is None
+  assert interpreter.get_output() == plain.get_output() == ['780']
+  assert interpreter.proven[1]   # add's return, which calls then run in place
+  assert interpreter.proven[9]   # main is hot too, through its loop
+  assert not interpreter.proven[len(program) - 2]
+  assert interpreter.unchecked == {'cold'}
+
+@pytest.mark.parametrize('hot', [1, 3, Interpreter.HOT])
+def test_hot_function_lines_another_function_can_reach_stay_checked(hot):
+  interpreter, error = run(JUMPS_INTO_G, hot, fast_paths=True)
+  plain, _ = run(JUMPS_INTO_G)
+  assert error is not None
+  assert interpreter.get_output() == plain.get_output() == ['-1', '0', '1', '2', '3']
+  assert interpreter.get_error_type_and_line() == plain.get_error_type_and_line() == (ErrorType.TYPE_ERROR, 17)
+  assert not interpreter.proven[17]
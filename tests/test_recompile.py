@@ -0,0 +1,120 @@
+import random
+import pytest
+from interpreterv2 import Interpreter
+from synth_v2 import generate, DEFAULTS
+
+PROGRAM = ['func add a:int b:int int',
+           ' return + a b',
+           'endfunc',
+           'func main void',
+           ' var int i s',
+           ' assign i 0',
+           ' while < i 5',
+           '  funccall add s i',
+           '  assign s resulti',
+           '  assign i + i 1',
+           ' endwhile',
+           ' funccall print s',
+           'endfunc']
+
+# no main, so it can only be load()ed and call()ed
+LIBRARY = ['func twice a:int int',
+           ' return * a 2',
+           'endfunc',
+           'func greet name:string string',
+           ' return + "hi " name',
+           'endfunc']
+
+# what the front end and the checker hold for the last program compiled
+def compiled(interpreter):
+  functions = dict((name, (info.start_ip, [(param, val.type()) for param, val in info.inputs], str(info.return_var)))
+                   for name, info in interpreter.func_manager.func_cache.items())
+  checker = interpreter.checker
+  return (interpreter.tokenized_program, interpreter.indents, functions, list(interpreter.proven),
+          checker and list(checker.types), checker and checker.errors)
+
+# run program, returning its output, error and exception type (or None)
+def outcome(interpreter, program):
+  interpreter.reset()
+  try:
+    interpreter.run(program)
+    error = None
+  except Exception as e:
+    error = type(e).__name__
+  return interpreter.get_output(), interpreter.get_error_type_and_line(), error
+
+# run each program in turn on one interpreter, so each run after the first is compiled incrementally, and
+# check that every run does and compiles to the same as a fresh interpreter given only that program
+def check_edits(programs, **kwargs):
+  interpreter = Interpreter(console_output=False, **kwargs)
+  for program in programs:
+    got = outcome(interpreter, program)
+    fresh = Interpreter(console_output=False, **kwargs)
+    assert got == outcome(fresh, list(program))
+    assert compiled(interpreter) == compiled(fresh)
+
+KWARGS = [{}, {'fail_fast': True}, {'fast_paths': True}]
+
+@pytest.mark.parametrize('kwargs', KWARGS)
+def test_editing_a_line(kwargs):
+  retyped = PROGRAM[:1] + [' return + a "b"'] + PROGRAM[2:]
+  check_edits([PROGRAM, retyped, PROGRAM, PROGRAM[:9] + [' assign i + i 2'] + PROGRAM[10:]], **kwargs)
+
+@pytest.mark.parametrize('kwargs', KWARGS)
+def test_adding_and_removing_functions(kwargs):
+  sub = ['func sub a:int b:int int', ' return - a b', 'endfunc']
+  with_sub = PROGRAM[:3] + sub + PROGRAM[3:7] + ['  funccall sub s 1', '  assign s resulti'] + PROGRAM[7:]
+  without_add = with_sub[3:6] + with_sub[6:]
+  check_edits([PROGRAM, with_sub, without_add, PROGRAM, PROGRAM + sub], **kwargs)
+
+@pytest.mark.parametrize('kwargs', KWARGS)
+def test_removing_main(kwargs):
+  check_edits([PROGRAM, PROGRAM[:3], PROGRAM], **kwargs)
+
+@pytest.mark.parametrize('kwargs', KWARGS)
+def test_editing_in_place(kwargs):
+  program = list(PROGRAM)
+  interpreter = Interpreter(console_output=False, **kwargs)
+  interpreter.run(program)
+  program[1] = ' return * a b'
+  program.insert(2, '')
+  assert outcome(interpreter, program) == outcome(Interpreter(console_output=False, **kwargs), list(program))
+  assert interpreter.get_output() == ['0']
+
+@pytest.mark.parametrize('kwargs', KWARGS)
+def test_loading_without_main(kwargs):
+  interpreter = Interpreter(console_output=False, **kwargs)
+  interpreter.load(LIBRARY)
+  assert interpreter.call('twice', 4) == 8
+  edited = LIBRARY[:1] + [' return * a 3'] + LIBRARY[2:] + ['func shout s:string string', ' return + s "!"', 'endfunc']
+  interpreter.load(edited)
+  fresh = Interpreter(console_output=False, **kwargs)
+  fresh.load(list(edited))
+  assert compiled(interpreter) == compiled(fresh)
+  assert interpreter.call('twice', 4) == fresh.call('twice', 4) == 12
+  assert interpreter.call('shout', 'hey') == 'hey!'
+  interpreter.load(LIBRARY[3:])
+  fresh = Interpreter(console_output=False, **kwargs)
+  fresh.load(LIBRARY[3:])
+  assert compiled(interpreter) == compiled(fresh)
+  assert interpreter.call('greet', 'you') == 'hi you'
+
+# random edits of a generated program: lines replaced, inserted and deleted, func and endfunc lines included
+@pytest.mark.parametrize('kwargs', KWARGS)
+def test_random_edits(kwargs):
+  rng = random.Random(34)
+  program = generate(**dict(DEFAULTS, lines=300))
+  pool = list(program) + PROGRAM + LIBRARY
+  programs = [program]
+  for _ in range(30):
+    program = list(program)
+    at = rng.randrange(len(program) + 1)
+    kind = rng.randrange(3)
+    if kind == 0 and at < len(program):
+      program[at] = rng.choice(pool)
+    elif kind == 1:
+      program[at:at] = rng.sample(pool, rng.randrange(1, 4))
+    else:
+      del program[at:at + rng.randrange(1, 4)]
+    programs.append(program)
+  check_edits(programs, **kwargs)
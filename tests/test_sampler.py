@@ -0,0 +1,35 @@
+from interpreterv2 import Interpreter
+from sampler_v2 import SamplingProfiler
+from source_v2 import MappedSource
+
+PROGRAM = ['func main void', ' funccall helper', 'endfunc', 'func helper void', ' funccall print "hi"', 'endfunc']
+
+# run program once with sampler, having marked what it had sampled so far, so a reset shows
+def sampled(sampler, program=None, path=None):
+  sampler.samples = 1000
+  interpreter = Interpreter(console_output=False, sampler=sampler)
+  if path:
+    interpreter.run_file(path)
+  else:
+    interpreter.run(program)
+  return sampler.samples >= 1000
+
+def test_samples_of_a_file_add_up_over_runs(tmp_path):
+  path = tmp_path / 'program.brewin'
+  path.write_text('\n'.join(PROGRAM) + '\n')
+  sampler = SamplingProfiler()
+  sampled(sampler, path=str(path))
+  assert type(sampler.program) is MappedSource   # kept mapped, not read into a list
+  assert sampler.func_names == ['main', 'helper']
+  assert sampled(sampler, path=str(path))
+
+def test_another_program_starts_over(tmp_path):
+  path = tmp_path / 'program.brewin'
+  path.write_text('\n'.join(PROGRAM) + '\n')
+  sampler = SamplingProfiler()
+  program = list(PROGRAM)
+  sampled(sampler, program)
+  assert sampled(sampler, program)
+  program[4] = ' funccall print "bye"'
+  assert not sampled(sampler, program)
+  assert not sampled(sampler, path=str(path))
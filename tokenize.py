@@ -6,13 +6,19 @@ from intbase import InterpreterBase, ErrorType
 class Tokenizer:
   # Performs tokenization and returns the tokenized program
   def tokenize_program(program):
-    tokenized_program = []
-    for line_num, line in enumerate(program):
-      tokens = Tokenizer._tokenize(line_num, line.rstrip())
-      tokenized_program.append(tokens)
-    return tokenized_program
+    return Tokenizer.tokenize_lines(program, 0, len(program))
+
+  # Tokenizes only lines start up to (not including) end of the program
+  def tokenize_lines(program, start, end):
+    tokenized_lines = []
+    for line_num in range(start, end):
+      tokens = Tokenizer._tokenize(line_num, program[line_num].rstrip())
+      tokenized_lines.append(tokens)
+    return tokenized_lines
 
   def _remove_comment(s):
+   if InterpreterBase.COMMENT_DEF not in s:
+     return s
    in_quote = False
    for i in range(0,len(s)):
      if s[i] == '"':
@@ -0,0 +1,281 @@
+import sys
+import json
+import struct
+import time
+import zlib
+from intbase import InterpreterBase, ErrorType
+from hooks_v2 import Hooks
+
+# A binary trace is MAGIC, the program's lines (zlib-compressed JSON, after their length), then one
+# 12 byte RECORD per event: the event's kind in the top 4 bits of a word whose other 28 hold an ip,
+# the nanoseconds since the record before it, and an operand whose meaning depends on the kind. The
+# (variable, value) pairs value records refer to come last, followed by their length and END. A trace
+# cut short (the process died) still reads, up to its last whole record, without the values.
+MAGIC = b'BRWT\x01'
+END = b'BRWE'
+LENGTH = struct.Struct('<I')
+RECORD = struct.Struct('<IIi')
+LINE, CALL, RETURN, PUSH, POP, VALUE, CLOCK, ERROR, FINISH = range(9)
+# operands:  LINE -, CALL the callee's first ip, RETURN the return ip, PUSH/POP the new block depth,
+# VALUE the index of the (variable, value) pair, CLOCK - (its delta holds the high 32 bits of the next
+# record's delta), ERROR the ErrorType's value (0 for a Python error; ip is NO_LINE if it had no line),
+# FINISH - (the run is over)
+KIND_SHIFT = 28
+IP_MASK = (1 << KIND_SHIFT) - 1
+NO_LINE = IP_MASK
+MAX_DELTA = 0xffffffff
+_pack = RECORD.pack
+_clock = time.perf_counter_ns
+MAX_VALUE = 200   # characters of a value kept in a value record
+
+# BinaryTracer writes every line, call, return and block scope change of each run to path as RECORDs,
+# buffering buffer_bytes of them between writes. With values, every assign is followed by a record of
+# the value the variable got.
+class BinaryTracer(Hooks):
+  def __init__(self, path, values=False, buffer_bytes=1 << 20):
+    self.path = path
+    self.values = values
+    self.buffer_bytes = buffer_bytes
+
+  def on_start(self, interpreter):
+    self.interpreter = interpreter
+    self.file = open(self.path, 'wb')
+    program = zlib.compress(json.dumps(list(interpreter.program)).encode())
+    self.file.write(MAGIC + LENGTH.pack(len(program)) + program)
+    self.buffer = bytearray()
+    self.values_seen = {}   # (variable, value) -> index
+    self.assigned = None   # (ip, name) of an assign that has yet to be recorded
+    self.last = _clock()
+
+  # the common case of _record written out, since it runs for every line
+  def on_line(self, ip):
+    if self.assigned:
+      self._record_value()
+    now = _clock()
+    delta = now - self.last
+    self.last = now
+    if delta > MAX_DELTA:
+      self.buffer += _pack(CLOCK << KIND_SHIFT, delta >> 32, 0)
+      delta &= MAX_DELTA
+    self.buffer += _pack(ip, delta, 0)   # LINE is 0
+    if len(self.buffer) >= self.buffer_bytes:
+      self.file.write(self.buffer)
+      self.buffer = bytearray()
+    if self.values:
+      tokens = self.interpreter.tokenized_program[ip]
+      if tokens and tokens[0] == InterpreterBase.ASSIGN_DEF and len(tokens) > 1:
+        self.assigned = (ip, tokens[1])
+
+  def on_call(self, name, ip, callee_ip):
+    self._record(CALL, ip, callee_ip)
+
+  def on_return(self, ip, return_ip):
+    self._record(RETURN, ip, return_ip)
+
+  def on_scope_push(self, ip, depth):
+    self._record(PUSH, ip, depth)
+
+  def on_scope_pop(self, ip, depth):
+    self._record(POP, ip, depth)
+
+  def on_error(self, error_type, line_num, exception):
+    self.assigned = None
+    self._record(ERROR, NO_LINE if line_num is None else line_num, error_type.value if error_type else 0)
+
+  def on_finish(self):
+    if self.assigned:
+      self._record_value()
+    self._record(FINISH, 0, 0)
+    values = zlib.compress(json.dumps(list(self.values_seen)).encode())
+    self.buffer += values + LENGTH.pack(len(values)) + END
+    self.file.write(self.buffer)
+    self.file.close()
+
+  # the buffer is only written out from on_line, which is never more than a call's few records away
+  def _record(self, kind, ip, operand):
+    now = _clock()
+    delta = now - self.last
+    self.last = now
+    if delta > MAX_DELTA:
+      self.buffer += _pack(CLOCK << KIND_SHIFT, delta >> 32, 0)
+      delta &= MAX_DELTA
+    self.buffer += _pack(kind << KIND_SHIFT | ip, delta, operand)
+
+  def _record_value(self):
+    ip, name = self.assigned
+    self.assigned = None
+    value = self.interpreter.env_manager.get(name)
+    if value is None:
+      return
+    text = str(value.value())
+    if value.type().name.endswith('STRING'):
+      text = f'"{text[:MAX_VALUE]}"' + ('...' if len(text) > MAX_VALUE else '')
+    index = self.values_seen.get((name, text))
+    if index is None:
+      index = self.values_seen[(name, text)] = len(self.values_seen)
+    self._record(VALUE, ip, index)
+
+# Trace is a trace file read back: the program, the (variable, value) pairs (None if the trace was cut
+# short) and the records, which events() gives back in order with absolute times
+class Trace:
+  def __init__(self, program, records, values):
+    self.program = program
+    self.records = records
+    self.values = values
+
+  def __len__(self):
+    return len(self.records) // RECORD.size
+
+  # (kind, ip, nanoseconds since the run started, operand) for every record but CLOCK
+  def events(self):
+    now = 0
+    high = 0
+    for word, delta, operand in RECORD.iter_unpack(self.records):
+      kind = word >> KIND_SHIFT
+      if kind == CLOCK:
+        high = delta << 32
+        continue
+      now += high + delta
+      high = 0
+      yield kind, word & IP_MASK, now, operand
+
+def read(path):
+  with open(path, 'rb') as f:
+    data = f.read()
+  if data[:len(MAGIC)] != MAGIC:
+    raise ValueError("Not a Brewin trace")
+  length, = LENGTH.unpack_from(data, len(MAGIC))
+  start = len(MAGIC) + LENGTH.size + length
+  program = json.loads(zlib.decompress(data[len(MAGIC) + LENGTH.size:start]))
+  values = None
+  end = len(data)
+  if data.endswith(END):
+    length, = LENGTH.unpack_from(data, end - len(END) - LENGTH.size)
+    end -= len(END) + LENGTH.size + length
+    values = [tuple(pair) for pair in json.loads(zlib.decompress(data[end:end + length]))]
+  end -= (end - start) % RECORD.size
+  return Trace(program, memoryview(data)[start:end], values)
+
+# ip -> [times executed, nanoseconds]; a line's time runs from its record to the next line's (or the
+# end of the run), so it includes the call or return it made
+def line_times(trace):
+  times = {}
+  current = None
+  last = now = 0
+  for kind, ip, now, operand in trace.events():
+    if kind != LINE:
+      continue
+    if current is not None:
+      times[current][1] += now - last
+    current, last = ip, now
+    times.setdefault(ip, [0, 0])[0] += 1
+  if current is not None:
+    times[current][1] += now - last
+  return times
+
+# CallNode is one calling context: a function reached through a particular chain of calls from main
+class CallNode:
+  def __init__(self, name):
+    self.name = name
+    self.calls = 0
+    self.time = 0           # nanoseconds from call to return, callees included
+    self.children = {}      # function name -> CallNode
+
+  def self_time(self):
+    return self.time - sum(child.time for child in self.children.values())
+
+# the tree of calling contexts rooted at main, with call counts and inclusive times; calls still open
+# when the trace ends (an error, or a cut short trace) end with it
+def call_tree(trace):
+  root = CallNode(InterpreterBase.MAIN_FUNC)
+  root.calls = 1
+  stack = [(root, 0)]
+  now = 0
+  for kind, ip, now, operand in trace.events():
+    if kind == CALL:
+      name = _called(trace.program, ip)
+      node = stack[-1][0].children.get(name)
+      if node is None:
+        node = stack[-1][0].children[name] = CallNode(name)
+      node.calls += 1
+      stack.append((node, now))
+    elif kind == RETURN and len(stack) > 1:
+      node, entered = stack.pop()
+      node.time += now - entered
+  while len(stack) > 1:
+    node, entered = stack.pop()
+    node.time += now - entered
+  root.time = now
+  return root
+
+def _called(program, ip):
+  words = program[ip].split(InterpreterBase.COMMENT_DEF)[0].split()
+  return words[1] if len(words) > 1 else '?'
+
+# while ip -> [times the loop was entered, iterations], from how often the while and its endwhile ran
+def loop_counts(trace):
+  counts = {}
+  for kind, ip, now, operand in trace.events():
+    if kind == LINE:
+      counts[ip] = counts.get(ip, 0) + 1
+  loops = {}
+  for while_ip, endwhile_ip in _loops(trace.program):
+    if while_ip in counts:
+      iterations = counts.get(endwhile_ip, 0)
+      loops[while_ip] = [counts[while_ip] - iterations, iterations]
+  return loops
+
+# (while ip, ip of its endwhile) for every loop, matched by indentation
+def _loops(program):
+  open_loops = []
+  for line_num, line in enumerate(program):
+    words = line.split(InterpreterBase.COMMENT_DEF)[0].split()
+    if not words:
+      continue
+    indent = len(line) - len(line.lstrip(' '))
+    if words[0] == InterpreterBase.WHILE_DEF:
+      open_loops.append((line_num, indent))
+    elif words[0] == InterpreterBase.ENDWHILE_DEF:
+      while open_loops and open_loops[-1][1] > indent:
+        open_loops.pop()
+      if open_loops and open_loops[-1][1] == indent:
+        yield open_loops.pop()[0], line_num
+
+# (ip, variable, value) for every value record, in order; empty if the trace was cut short
+def assignments(trace):
+  if trace.values is None:
+    return []
+  return [(ip,) + trace.values[operand] for kind, ip, now, operand in trace.events() if kind == VALUE]
+
+# hottest lines, loops by iterations, the call tree and how the run ended
+def report(trace, limit=20):
+  out = [f"{len(trace)} records" + ('' if trace.values is not None else ', cut short'), '', 'Hot lines:',
+         f"{'line':>6} {'count':>10} {'total ms':>10} {'us/hit':>8}  source"]
+  times = line_times(trace)
+  for ip in sorted(times, key=lambda ip: times[ip][1], reverse=True)[:limit]:
+    count, total = times[ip]
+    out.append(f"{ip:6} {count:10} {total / 1e6:10.3f} {total / 1e3 / count:8.2f}  {trace.program[ip].strip()}")
+  loops = loop_counts(trace)
+  out += ['', 'Loops:', f"{'line':>6} {'entered':>10} {'iterations':>11} {'per entry':>10}  source"]
+  for ip in sorted(loops, key=lambda ip: loops[ip][1], reverse=True)[:limit]:
+    entered, iterations = loops[ip]
+    out.append(f"{ip:6} {entered:10} {iterations:11} {iterations / max(entered, 1):10.1f}  {trace.program[ip].strip()}")
+  out += ['', 'Calls:', f"{'calls':>10} {'incl ms':>10} {'self ms':>10}  function"]
+  _tree_lines(call_tree(trace), 0, limit, out)
+  for kind, ip, now, operand in trace.events():
+    if kind == ERROR:
+      out += ['', f"Stopped by {ErrorType(operand).name if operand else 'a Python error'}" + (f" on line {ip}" if ip != NO_LINE else '')]
+  return '\n'.join(out)
+
+def _tree_lines(node, depth, limit, out):
+  out.append(f"{node.calls:10} {node.time / 1e6:10.3f} {node.self_time() / 1e6:10.3f}  {'  ' * depth}{node.name}")
+  if depth + 1 >= limit:
+    return
+  for child in sorted(node.children.values(), key=lambda child: child.time, reverse=True):
+    _tree_lines(child, depth + 1, limit, out)
+
+if __name__ == "__main__":
+  if len(sys.argv) not in (2, 3):
+    print("usage: python trace_v2.py trace_file [limit]")
+    sys.exit(1)
+  print(report(read(sys.argv[1]), int(sys.argv[2]) if len(sys.argv) == 3 else 20))
@@ -42,4 +42,9 @@ class Value:
     return self.t
   
   def __str__(self):
-    return ("(type:" +str(self.t)+", value:"+str(self.v)+", ref:"+str(self.r)+")")
\ No newline at end of file
+    return ("(type:" +str(self.t)+", value:"+str(self.v)+", ref:"+str(self.r)+")")
+
+# Holds a Python value passed to a ref parameter through Interpreter.call; value is updated when the call returns
+class Ref:
+  def __init__(self, value):
+    self.value = value
@@ -0,0 +1,34 @@
+import os
+import sys
+import time
+from interpreterv2 import Interpreter
+
+# Runs a Brewin source file every time it is saved. The same Interpreter is reused, so each run only
+# recompiles the lines that changed since the last one.
+def watch(path, interval=0.2, **interpreter_args):
+  interpreter = Interpreter(**interpreter_args)
+  last_modified = None
+  while True:
+    modified = os.stat(path).st_mtime_ns
+    if modified != last_modified:
+      last_modified = modified
+      with open(path) as f:
+        program = f.read().splitlines()
+      print(f"--- {path} ---")
+      interpreter.reset()
+      start = time.perf_counter()
+      try:
+        interpreter.run(program)
+      except Exception as e:
+        print(e)
+      print(f"--- done in {(time.perf_counter() - start) * 1e3:.1f} ms ---")
+    time.sleep(interval)
+
+if __name__ == "__main__":
+  if len(sys.argv) != 2:
+    print("usage: python watch_v2.py program.brewin")
+    sys.exit(1)
+  try:
+    watch(sys.argv[1])
+  except KeyboardInterrupt:
+    pass